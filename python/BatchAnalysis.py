@@ -0,0 +1,105 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from GetAnalysis import p_adjust_bh, significance_stars, t_test, wilcox_test, yuen_test
+
+
+def _sample_matrix(values, codes, n_sample):
+    # One column per sample, replicates down the rows, NaN-padded to the largest sample
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    starts = np.searchsorted(sorted_codes, np.arange(n_sample))
+    row = np.arange(len(codes)) - starts[sorted_codes]
+    matrix = np.full((row.max() + 1 if len(row) else 0, n_sample), np.nan)
+    matrix[row, sorted_codes] = values[order]
+    return matrix
+
+
+def GetBatchAnalysis(calculation, control, test='wilcox', alternative='two.sided', terms=('RAF', 'MPR', 'MS'),
+                     pool_by=None, id_col='content', adjust_p=True, alpha=0.05):
+    """
+    Perform Statistical Analysis Across a Batch of Plates.
+
+    Every sample of every plate is tested against the control wells pooled over the whole batch
+    (or over each group given by `pool_by`, e.g. a run date), instead of against the controls of
+    its own plate. All samples of a pool are tested in one batched call per metric, and the
+    Benjamini-Hochberg correction is applied across the whole batch.
+
+    :param calculation: The combined calculation of many plates, e.g. `BulkProcessing()['combined_calculation']`.
+                        Needs 'plate_name', `id_col` and the metric columns.
+    :param control: The name or regular expression pattern of the control content.
+    :param test: 't-test', 'wilcox' or 'yuen', as in `GetAnalysis()`. Default is 'wilcox'.
+    :param alternative: Options are 'two.sided', 'less', or 'greater'. Default is 'two.sided'.
+    :param terms: Metric columns to test. Default is 'RAF', 'MPR' and 'MS'.
+    :param pool_by: None to pool the controls of all plates, the name of a column of `calculation`,
+                    or a function mapping a plate name to its pool (e.g. `lambda name: name[:8]` for the run date).
+    :param id_col: The name of the column identifying the sample. Default is 'content'.
+    :param adjust_p: Boolean. Whether to adjust p-values across the batch. Default is True.
+    :param alpha: The significance level for determining significance stars. Default is 0.05.
+    :return: A DataFrame with one row per metric, plate and sample: 'metric', 'pool', 'plate_name', `id_col`,
+             'n', 'statistic', 'p_value', 'adj_p' (only if adjust_p) and 'significant'.
+    """
+    if test == "t-test":
+        test_fun = t_test
+    elif test == "wilcox":
+        test_fun = wilcox_test
+    elif test == "yuen":
+        test_fun = yuen_test
+    else:
+        raise ValueError("Invalid test specified")
+
+    missing = [col for col in ('plate_name', id_col, *terms) if col not in calculation.columns]
+    if missing:
+        raise ValueError(f"Columns missing from the calculation data frame: {missing}")
+
+    if pool_by is None:
+        pool = np.zeros(len(calculation), dtype=int)
+        pool_labels = pd.Index(['all'])
+    elif callable(pool_by):
+        pool, pool_labels = pd.factorize(calculation['plate_name'].map(pool_by))
+    else:
+        pool, pool_labels = pd.factorize(calculation[pool_by])
+
+    sample_codes, samples = pd.factorize(pd.MultiIndex.from_arrays([calculation['plate_name'], calculation[id_col]]))
+    n_sample = len(samples)
+    is_control = calculation[id_col].astype(str).map(lambda c: re.search(control, c) is not None).to_numpy()
+    sample_pool = np.zeros(n_sample, dtype=int)
+    sample_pool[sample_codes] = pool
+    sample_n = np.bincount(sample_codes, minlength=n_sample)
+
+    tables = []
+    for term in terms:
+        values = calculation[term].to_numpy(dtype=float)
+        if term == "time_to_threshold":
+            values = np.nan_to_num(values, nan=0.0)
+
+        matrix = _sample_matrix(values, sample_codes, n_sample)
+        statistic = np.full(n_sample, np.nan)
+        p_value = np.full(n_sample, np.nan)
+        for p in range(len(pool_labels)):
+            cols = np.flatnonzero(sample_pool == p)
+            control_values = values[(pool == p) & is_control]
+            if len(cols) == 0 or len(control_values) == 0:
+                continue
+            statistic[cols], p_value[cols] = test_fun(matrix[:, cols], control_values, alternative=alternative)
+
+        table = pd.DataFrame({
+            'metric': term,
+            'pool': pool_labels[sample_pool],
+            'plate_name': samples.get_level_values(0),
+            id_col: samples.get_level_values(1),
+            'n': sample_n,
+            'statistic': np.round(statistic, 2),
+            'p_value': np.round(p_value, 5),
+        })
+        if adjust_p:
+            # Batch-wide FDR for this metric
+            table['adj_p'] = np.round(p_adjust_bh(table['p_value']), 5)
+            table['significant'] = significance_stars(table['adj_p'], alpha)
+        else:
+            table['significant'] = significance_stars(table['p_value'], alpha)
+        tables.append(table)
+
+    return pd.concat(tables, ignore_index=True)
@@ -0,0 +1,255 @@
+"""
+Time every stage of the QuICSeedR pipeline on the bundled datasets and on synthetic plates.
+
+    python Benchmark.py                                   # all bundled datasets
+    python Benchmark.py --datasets grinder --repeat 5
+    python Benchmark.py --synthetic 2000 --output bench.json
+
+Results are written as JSON, one run per dataset, with the total and per-plate time of each stage,
+timed both cold (no work reused between plates sharing a layout) and warm.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from BulkReadMARS import BulkReadMARS
+from CleanMeta import CleanMeta
+from CleanRaw import CleanRaw
+from ConvertTime import ConvertTime
+from GetAnalysis import GetAnalysis
+from GetCalculation import GetCalculation
+from GetReplicate import GetReplicate
+from PlateGeometry import GetPlateGeometry
+from PlateLayout import ClearLayoutCache, layout_fingerprint
+from ReadMARS import MARSRaw
+from SpreadCalculation import SpreadCalculation
+from SummarizeResult import SummarizeResult
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = ("BulkReadMARS", "ConvertTime", "GetReplicate", "CleanMeta", "CleanRaw", "GetCalculation",
+          "SpreadCalculation", "GetAnalysis", "SummarizeResult")
+
+# Bundled datasets and the stage parameters they are analysed with
+DATASETS = {
+    "grinder": ("tutorials/data/grinder", {
+        'GetCalculation': dict(norm=True, norm_ct='pos', sd_fold=10, cycle_background=6),
+        'GetAnalysis': dict(control='neg', alternative='greater'),
+        'SummarizeResult': dict(sig_method='metric_count', method_threshold=3),
+    }),
+    "elkear": ("tutorials/data/elkear", {
+        'GetCalculation': dict(sd_fold=10),
+        'GetAnalysis': dict(control='Neg', alternative='greater'),
+    }),
+    "plasma": ("tutorials/data/plasma", {
+        'GetAnalysis': dict(control='HC', alternative='greater'),
+    }),
+    "extdata": ("inst/extdata", {
+        'GetCalculation': dict(sd_fold=10),
+        'GetAnalysis': dict(control='Neg', alternative='greater'),
+    }),
+}
+
+SYNTHETIC_PARAMS = {
+    'GetAnalysis': dict(control='neg', alternative='greater'),
+}
+
+
+def SyntheticPlates(n_plates, plate_format=384, n_cycle=97, cycle_minutes=15, n_rep=4, seed=0, n_layouts=1):
+    """
+    Generate plates shaped like `BulkReadMARS()` output.
+
+    Every sample fills `n_rep` consecutive wells of one plate column; the first sample is 'neg'
+    and the second 'pos'. Seeded samples follow a logistic curve with a random lag, the others
+    stay at background, and every reading gets multiplicative noise.
+
+    :param n_plates: Number of plates.
+    :param plate_format: 96, 384 or 1536. Default is 384.
+    :param n_cycle: Number of cycles per run.
+    :param cycle_minutes: Minutes between cycles.
+    :param n_rep: Replicates per sample.
+    :param seed: Seed of the random generator.
+    :param n_layouts: Number of distinct layouts, used in turn; layouts after the first place the
+                      samples after 'neg' and 'pos' in a different order. Default is 1.
+    :return: A dict of plates keyed by plate name, each a dict with 'plate', 'raw' and 'replicate'.
+    """
+    geometry = GetPlateGeometry(plate_format)
+    rng = np.random.default_rng(seed)
+    minutes = np.arange(n_cycle) * cycle_minutes
+    time = minutes / 60
+    time_label = np.array([f"{m // 60} h {m % 60} min" if m % 60 else f"{m // 60} h" for m in minutes], dtype=object)
+
+    # Sample of each well, filled column by column in blocks of n_rep rows
+    n_block = geometry.n_row // n_rep
+    sample = geometry.col_index * n_block + geometry.row_index // n_rep
+    names = np.array(['neg', 'pos'] + [f"S{i}" for i in range(2, sample.max() + 1)], dtype=object)
+    layouts = [names] + [np.concatenate([names[:2], rng.permutation(names[2:])]) for _ in range(n_layouts - 1)]
+
+    data = {}
+    for p in range(n_plates):
+        seeded = rng.random(sample.max() + 1) < 0.4
+        seeded[0], seeded[1] = False, True
+        lag = rng.uniform(10, 40, sample.max() + 1)
+        amplitude = np.where(seeded, rng.uniform(5, 20, sample.max() + 1), 0)
+
+        well_lag = lag[sample] + rng.normal(0, 1.5, geometry.format)
+        curve = 1 + amplitude[sample] / (1 + np.exp(-(time[:, None] - well_lag) * 0.6))
+        values = 2000 * curve * rng.normal(1, 0.02, (n_cycle, geometry.format))
+
+        content = layouts[p % len(layouts)][sample]
+        plate = pd.DataFrame(content.reshape(geometry.n_row, geometry.n_col),
+                             columns=[int(c) for c in geometry.cols])
+        plate.insert(0, 'Unnamed: 0', list(geometry.rows))
+
+        raw = MARSRaw(
+            time=time, values=values, well=geometry.well.copy(), content=content,
+            time_label=time_label, read_label='Raw Data (485/520)', time_header='Time',
+        )
+        data[f"synthetic_{p:05d}"] = {'plate': plate, 'raw': raw, 'replicate': GetReplicate(plate)}
+    return data
+
+
+def _time_plates(data, params, timings, cold=True):
+    # Runs the stages of BulkProcessing on every plate, adding each stage's wall time to `timings`.
+    # GetReplicate, CleanMeta and CleanRaw reuse their work across plates sharing a layout; cold
+    # clears that cache before every plate, so they are timed as if every layout were new.
+    def timed(stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        out = func(*args, **kwargs)
+        timings[stage] += time.perf_counter() - start
+        return out
+
+    ClearLayoutCache()
+    for experiment in data.values():
+        if cold:
+            ClearLayoutCache()
+        raw = experiment['raw']
+        replicate = timed("GetReplicate", GetReplicate, experiment['plate'])
+        plate_time = timed("ConvertTime", ConvertTime, raw, **params.get('ConvertTime', {}))
+        meta = timed("CleanMeta", CleanMeta, raw, experiment['plate'], replicate, **params.get('CleanMeta', {}))
+        clean_raw = timed("CleanRaw", CleanRaw, meta, raw, plate_time, **params.get('CleanRaw', {}))
+        calculation = timed("GetCalculation", GetCalculation, clean_raw, meta, **params.get('GetCalculation', {}))
+        spread = timed("SpreadCalculation", SpreadCalculation, calculation, **params.get('SpreadCalculation', {}))
+        analysis = timed("GetAnalysis", GetAnalysis, spread, **params.get('GetAnalysis', {}))
+        timed("SummarizeResult", SummarizeResult, analysis, calculation, **params.get('SummarizeResult', {}))
+
+
+def run_benchmark(name, params, path=None, data=None, repeat=3):
+    """
+    Time every stage on one dataset.
+
+    :param name: Name of the run in the report.
+    :param params: Stage parameters, as passed to `BulkProcessing()`.
+    :param path: Folder read with `BulkReadMARS()`. Either `path` or `data` is required.
+    :param data: Plates already in memory (e.g. from `SyntheticPlates()`); BulkReadMARS is then not timed.
+    :param repeat: Number of repetitions; the report keeps the best and the median.
+    :return: A dict describing the run. 'stages' holds cold timings, with no work reused between
+             plates of the same layout; 'stages_warm' the timings of a normal run, where plates
+             sharing a layout reuse it (only the first plate of each of the 'n_layouts' pays).
+    """
+    runs, warm_runs = [], []
+    for _ in range(repeat):
+        timings = dict.fromkeys(STAGES, 0.0)
+        if path is not None:
+            start = time.perf_counter()
+            data = BulkReadMARS(path, '_plate', '_raw')
+            timings["BulkReadMARS"] = time.perf_counter() - start
+        _time_plates(data, params, timings, cold=True)
+        runs.append(timings)
+
+        warm = dict.fromkeys(STAGES, 0.0)
+        _time_plates(data, params, warm, cold=False)
+        warm_runs.append(warm)
+
+    n_plates = len(data)
+
+    def summarize(runs):
+        stages = {}
+        for stage in STAGES:
+            if stage == "BulkReadMARS" and (path is None or runs is warm_runs):
+                continue
+            totals = [run[stage] for run in runs]
+            stages[stage] = {
+                'best_s': min(totals),
+                'median_s': statistics.median(totals),
+                'per_plate_ms': min(totals) / n_plates * 1000,
+            }
+        return stages
+
+    stages, stages_warm = summarize(runs), summarize(warm_runs)
+    return {
+        'dataset': name,
+        'path': os.path.relpath(path, REPO_ROOT) if path is not None else None,
+        'n_plates': n_plates,
+        'n_wells': int(sum(len(experiment['raw'].well) for experiment in data.values())),
+        'n_layouts': len({layout_fingerprint(experiment['plate']) for experiment in data.values()}),
+        'repeat': repeat,
+        'total_best_s': sum(stage['best_s'] for stage in stages.values()),
+        'stages': stages,
+        'stages_warm': stages_warm,
+    }
+
+
+def _environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the QuICSeedR pipeline stage by stage.")
+    parser.add_argument('--datasets', nargs='*', default=list(DATASETS), choices=list(DATASETS),
+                        help="Bundled datasets to run. Default is all of them.")
+    parser.add_argument('--synthetic', type=int, default=0, help="Number of synthetic plates. Default is 0.")
+    parser.add_argument('--synthetic-format', type=int, default=384, choices=[96, 384, 1536])
+    parser.add_argument('--synthetic-layouts', type=int, default=1,
+                        help="Number of distinct layouts among the synthetic plates. Default is 1.")
+    parser.add_argument('--repeat', type=int, default=3, help="Repetitions per dataset. Default is 3.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="JSON file to write. Default is standard output.")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.datasets:
+        path, params = DATASETS[name]
+        results.append(run_benchmark(name, params, path=os.path.join(REPO_ROOT, path), repeat=args.repeat))
+        print(f"{name}: {results[-1]['total_best_s']:.3f} s", file=sys.stderr)
+
+    if args.synthetic > 0:
+        data = SyntheticPlates(args.synthetic, plate_format=args.synthetic_format, seed=args.seed,
+                               n_layouts=args.synthetic_layouts)
+        name = f"synthetic_{args.synthetic}x{args.synthetic_format}"
+        results.append(run_benchmark(name, SYNTHETIC_PARAMS, data=data, repeat=args.repeat))
+        print(f"{name}: {results[-1]['total_best_s']:.3f} s", file=sys.stderr)
+
+    report = {'environment': _environment(), 'results': results}
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
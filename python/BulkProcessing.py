@@ -0,0 +1,348 @@
+import math
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from CleanMeta import CleanMeta
+from CleanRaw import CleanRaw
+from ConvertTime import ConvertTime
+from GetAnalysis import GetAnalysis
+from GetCalculation import GetCalculation
+from ResultSink import ColumnarSink, LoadCleanRaw, SpillCleanRaw
+from SpreadCalculation import SpreadCalculation
+from SummarizeResult import SummarizeResult
+
+
+def _run_uncached(stage, parents, func, inputs, params):
+    return func(**inputs, **params), None
+
+
+def _process_plate(name, experiment, do_analysis, params, verbose, cache=None, instrument=None):
+    # Runs the whole pipeline on one plate; returns (calculation, raw, result) or None on failure
+    if instrument is None:
+        return _run_pipeline(name, experiment, do_analysis, params, verbose, cache, None)
+
+    token = instrument.start(name, 'plate')
+    output = None
+    try:
+        output = _run_pipeline(name, experiment, do_analysis, params, verbose, cache, instrument)
+    finally:
+        instrument.stop(token, output[0] if output is not None else None, ok=output is not None)
+    return output
+
+
+def _run_pipeline(name, experiment, do_analysis, params, verbose, cache, instrument):
+    def log(*args):
+        if verbose:
+            print(*args)
+
+    plate = experiment['plate']
+    raw = experiment['raw']
+    replicate = experiment['replicate']
+
+    log(f"Processing plate {name}")
+
+    # With a StageCache each stage is keyed by its params and the keys of the stages it consumes
+    if cache is None:
+        run, raw_key, plate_key = _run_uncached, None, None
+    else:
+        run, raw_key, plate_key = cache.run, cache.fingerprint(raw), cache.fingerprint(plate, replicate)
+    if instrument is not None:
+        run = instrument.wrap(name, run)
+
+    plate_time, time_key = run('ConvertTime', (raw_key,), ConvertTime, {'raw': raw},
+                               params.get('ConvertTime', {}))
+
+    meta, meta_key = run('CleanMeta', (raw_key, plate_key), CleanMeta,
+                         {'raw': raw, 'plate': plate, 'replicate': replicate}, params.get('CleanMeta', {}))
+
+    clean_raw_params = params.get('CleanRaw', {})
+
+    # CleanRaw
+    try:
+        raw, clean_key = run('CleanRaw', (meta_key, raw_key, time_key), CleanRaw,
+                             {'meta': meta, 'raw': raw, 'plate_time': plate_time}, clean_raw_params)
+    except Exception as e:
+        log(f"Error in CleanRaw for plate {name}: {str(e)}")
+        return None
+
+    if raw is None:
+        log(f"Skipping further processing for plate {name}")
+        return None
+
+    log(f"Dimensions of cleaned raw: {raw.shape}")
+
+    # GetCalculation
+    try:
+        calculation, calculation_key = run('GetCalculation', (clean_key, meta_key), GetCalculation,
+                                           {'raw': raw, 'meta': meta}, params.get('GetCalculation', {}))
+    except Exception as e:
+        log(f"Error in GetCalculation for plate {name}: {str(e)}")
+        return None
+
+    if calculation is None:
+        log(f"Skipping further processing for plate {name}")
+        return None
+
+    # SpreadCalculation and GetAnalysis
+    analysis, analysis_key = None, None
+    if do_analysis:
+        calculation_spread, spread_key = run('SpreadCalculation', (calculation_key,), SpreadCalculation,
+                                             {'calculation': calculation}, params.get('SpreadCalculation', {}))
+        analysis, analysis_key = run('GetAnalysis', (spread_key,), GetAnalysis,
+                                     {'calculation_spread': calculation_spread}, params.get('GetAnalysis', {}))
+
+    # SummarizeResult
+    try:
+        result, _ = run('SummarizeResult', (str(analysis_key), calculation_key), SummarizeResult,
+                        {'analysis': analysis, 'calculation': calculation}, params.get('SummarizeResult', {}))
+    except Exception as e:
+        log(f"Error in SummarizeResult for plate {name}: {str(e)}")
+        return None
+
+    if result is None:
+        return None
+
+    return calculation, raw, result
+
+
+def _process_chunk(chunk, do_analysis, params, verbose, cache=None, instrument=None):
+    # Worker entry point: a list of (name, experiment) pairs in, a list of (name, output) pairs out,
+    # plus the instrumentation records made here so a parent process can merge them
+    n_records = len(instrument.records) if instrument is not None else 0
+    outputs = [(name, _process_plate(name, experiment, do_analysis, params, verbose, cache, instrument))
+               for name, experiment in chunk]
+    return outputs, instrument.records[n_records:] if instrument is not None else []
+
+
+def _timed_items(items, instrument):
+    # Times each pull from a lazy source such as IterReadMARS as a 'read' stage
+    items = iter(items)
+    while True:
+        token = instrument.start(None, 'read')
+        try:
+            name, experiment = next(items)
+        except StopIteration:
+            # The source is exhausted, so nothing was read
+            instrument.discard(token)
+            return
+        except BaseException:
+            instrument.stop(token, ok=False)
+            raise
+        raw = experiment.get('raw') if isinstance(experiment, dict) else None
+        instrument.stop(token, getattr(raw, 'values', None), plate=name)
+        yield name, experiment
+
+
+CLEANRAW_MODES = ('keep', 'spill', 'mmap', 'drop')
+
+
+def _iter_outputs(items, do_analysis, params, verbose, n_workers, chunk_size, cache=None, instrument=None):
+    # Yields (name, output) in input order, keeping at most 2 * n_workers chunks in flight
+    if n_workers is None or n_workers <= 1:
+        for name, experiment in items:
+            yield name, _process_plate(name, experiment, do_analysis, params, verbose, cache, instrument)
+        return
+
+    def chunks():
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def collect(future):
+        outputs, records = future.result()
+        if instrument is not None:
+            instrument.records.extend(records)
+        return outputs
+
+    pending = chunks()
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        in_flight = deque()
+        for chunk in pending:
+            in_flight.append(executor.submit(_process_chunk, chunk, do_analysis, params, verbose, cache,
+                                             instrument))
+            if len(in_flight) >= 2 * n_workers:
+                yield from collect(in_flight.popleft())
+        while in_flight:
+            yield from collect(in_flight.popleft())
+
+
+def IterBulkProcessing(data, do_analysis=True, params=None, verbose=False, n_workers=1, chunk_size=1,
+                       cleanraw='keep', spill_dir=None, cache=None, instrument=None):
+    """
+    Process Plates One at a Time, Yielding Each Result.
+
+    Plates are pulled from `data` as they are needed, so an iterator such as `IterReadMARS()`
+    is never read ahead by more than the plates in flight, and a plate is released as soon
+    as its result has been consumed.
+
+    :param data: A dict of plates keyed by plate name, or any iterable of `(name, plate)` pairs
+                 (e.g. `IterReadMARS()`).
+    :param do_analysis: Boolean, whether to run SpreadCalculation and GetAnalysis. Default is True.
+    :param params: A dict of keyword arguments for each stage, keyed by stage name.
+    :param verbose: Boolean, whether to print progress. Default is False.
+    :param n_workers: Number of worker processes. 1 (default) processes plates in this process.
+    :param chunk_size: Number of plates sent to a worker at a time. Default is 1.
+    :param cleanraw: What to do with each cleaned raw matrix: 'keep' (default) yields the DataFrame,
+                     'spill' writes it under `spill_dir` and yields the folder (see `LoadCleanRaw()`),
+                     'mmap' writes it and yields a DataFrame memory-mapped from disk, 'drop' yields None.
+    :param spill_dir: Folder for spilled matrices. Required for 'spill' and 'mmap'.
+    :param cache: Optional `StageCache` memoizing each stage per plate.
+    :param instrument: Optional `Instrumentation` recording every stage. Pulling a plate from a lazy
+                       `data` is recorded as the 'read' stage.
+    :return: A generator of `(name, calculation, cleanraw, result)` tuples. Plates that fail are
+             skipped and keep their input order otherwise.
+    """
+    if cleanraw not in CLEANRAW_MODES:
+        raise ValueError(f"Invalid cleanraw. Must be one of: {', '.join(CLEANRAW_MODES)}")
+    if cleanraw in ('spill', 'mmap') and spill_dir is None:
+        raise ValueError(f"'spill_dir' is required when cleanraw is '{cleanraw}'")
+    if params is None:
+        params = {}
+
+    if isinstance(data, dict):
+        items = data.items()
+    else:
+        items = data if instrument is None else _timed_items(data, instrument)
+    for name, output in _iter_outputs(iter(items), do_analysis, params, verbose, n_workers, chunk_size, cache,
+                                      instrument):
+        if output is None:
+            continue
+        calculation, raw, result = output
+        if cleanraw == 'drop':
+            raw = None
+        elif cleanraw == 'spill':
+            raw = SpillCleanRaw(raw, spill_dir, name)
+        elif cleanraw == 'mmap':
+            raw = LoadCleanRaw(SpillCleanRaw(raw, spill_dir, name))
+        yield name, calculation, raw, result
+
+
+def StreamBulkProcessing(data, sink_dir, do_analysis=True, params=None, verbose=False, n_workers=1,
+                         chunk_size=1, cleanraw='spill', flush_rows=100_000, cache=None, instrument=None):
+    """
+    Process Plates Into an On-Disk Sink.
+
+    The streaming counterpart of `BulkProcessing()`: 'combined_calculation' and 'combined_result'
+    are appended to a `ColumnarSink` in `sink_dir` as plates finish, instead of being concatenated
+    in memory. Cleaned raw matrices are spilled to `sink_dir/cleanraw` (or dropped), so memory use
+    does not grow with the number of plates.
+
+    :param data: A dict of plates or an iterable of `(name, plate)` pairs, as in `IterBulkProcessing()`.
+    :param sink_dir: Folder for the sink. Tables already in it are appended to.
+    :param do_analysis: Boolean, whether to run SpreadCalculation and GetAnalysis. Default is True.
+    :param params: A dict of keyword arguments for each stage, keyed by stage name.
+    :param verbose: Boolean, whether to print progress. Default is False.
+    :param n_workers: Number of worker processes. Default is 1.
+    :param chunk_size: Number of plates sent to a worker at a time. Default is 1.
+    :param cleanraw: 'spill' (default) or 'drop'.
+    :param flush_rows: Rows buffered per table before a part is written (see `ColumnarSink`).
+    :param cache: Optional `StageCache` memoizing each stage per plate.
+    :param instrument: Optional `Instrumentation` recording every stage (see `IterBulkProcessing()`).
+    :return: The `ColumnarSink`; read the tables back with `sink.read('combined_calculation')`.
+             None if no plate was processed successfully.
+    """
+    if cleanraw not in ('spill', 'drop'):
+        raise ValueError("Invalid cleanraw. Must be one of: spill, drop")
+
+    n_plates = 0
+    with ColumnarSink(sink_dir, flush_rows=flush_rows) as sink:
+        for name, calculation, _, result in IterBulkProcessing(
+                data, do_analysis=do_analysis, params=params, verbose=verbose, n_workers=n_workers,
+                chunk_size=chunk_size, cleanraw=cleanraw, spill_dir=os.path.join(sink_dir, 'cleanraw'),
+                cache=cache, instrument=instrument):
+            sink.append('combined_calculation', calculation.assign(plate_name=name))
+            sink.append('combined_result', result.assign(plate_name=name))
+            n_plates += 1
+
+    if n_plates == 0:
+        print("Warning: No plates were successfully processed.")
+        return None
+
+    return sink
+
+
+def BulkProcessing(data, do_analysis=True, params=None, verbose=False, n_workers=1, chunk_size=None,
+                   cross_check=0, cache=None, instrument=None):
+    """
+    Process every plate in `data` and combine the results.
+
+    :param data: Output of `BulkReadMARS()`, a dict of plates keyed by plate name (a list is also accepted).
+    :param do_analysis: Boolean, whether to run SpreadCalculation and GetAnalysis. Default is True.
+    :param params: A dict of keyword arguments for each stage, keyed by stage name.
+    :param verbose: Boolean, whether to print progress. Default is False.
+    :param n_workers: Number of worker processes. 1 (default) processes plates in this process.
+    :param chunk_size: Number of plates sent to a worker at a time. By default plates are split
+                       into about four chunks per worker.
+    :param cross_check: Number of randomly chosen plates to re-run through the R package with `CrossCheck()`.
+                        Requires rpy2 and QuICSeedR. Default is 0 (off).
+    :param cache: Optional `StageCache`. Stages whose inputs and params are unchanged since an earlier
+                  run are read from it, so changing e.g. only the SummarizeResult params re-runs only
+                  SummarizeResult. Worker processes share its disk tier, not its memory.
+    :param instrument: Optional `Instrumentation` recording the time, CPU and memory of every stage of
+                       every plate, including those run in worker processes.
+    :return: A dict with 'combined_calculation', 'combined_cleanraw' and 'combined_result' (plus
+             'cross_check' when requested), or None if no plate was processed successfully.
+             Plates keep the order of `data`.
+    """
+    if params is None:
+        params = {}
+
+    items = list(data.items()) if isinstance(data, dict) else list(enumerate(data))
+
+    if n_workers is None or n_workers <= 1 or len(items) <= 1:
+        outputs, _ = _process_chunk(items, do_analysis, params, verbose, cache, instrument)
+    else:
+        if chunk_size is None:
+            chunk_size = max(1, math.ceil(len(items) / (n_workers * 4)))
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+        # Futures are collected in submission order so the merge does not depend on scheduling
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = [executor.submit(_process_chunk, chunk, do_analysis, params, verbose, cache, instrument)
+                       for chunk in chunks]
+            outputs = []
+            for future in futures:
+                chunk_outputs, records = future.result()
+                outputs.extend(chunk_outputs)
+                if instrument is not None:
+                    instrument.records.extend(records)
+
+    subcalculation = {}
+    subcleanraw = {}
+    subresult = {}
+
+    for name, output in outputs:
+        if output is None:
+            continue
+        subcalculation[name], subcleanraw[name], subresult[name] = output
+
+    # Check if no plates were processed successfully
+    if len(subcalculation) == 0:
+        print("Warning: No plates were successfully processed.")
+        return None
+
+    # Combine results
+    combined_calculation = pd.concat([v.assign(plate_name=k) for k, v in subcalculation.items()], ignore_index=True)
+    combined_result = pd.concat([v.assign(plate_name=k) for k, v in subresult.items()], ignore_index=True)
+
+    processed = {
+        'combined_calculation': combined_calculation,
+        'combined_cleanraw': subcleanraw,
+        'combined_result': combined_result
+    }
+
+    if cross_check:
+        # Imported here so rpy2 is only needed when the R comparison is asked for
+        from CrossCheck import CrossCheck
+        processed['cross_check'] = CrossCheck(data, params=params, n_plates=cross_check,
+                                              do_analysis=do_analysis, processed=processed)
+
+    return processed
@@ -0,0 +1,122 @@
+import os
+import warnings
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from GetReplicate import GetReplicate
+from PlateCache import LoadPlateFolder
+from ReadMARS import ReadMARS, ReadPlate
+
+
+def _find_files(folder_path, plate_subfix, raw_subfix):
+    # Get all Excel files in the folder and identify plate and raw data files
+    files = sorted(f for f in os.listdir(folder_path) if f.endswith('.xlsx'))
+    plate_files = [f for f in files if plate_subfix in f]
+    raw_files = [f for f in files if raw_subfix in f]
+    if not plate_files or not raw_files:
+        return None
+    return os.path.join(folder_path, plate_files[0]), os.path.join(folder_path, raw_files[0])
+
+
+def _read_folder(folder_path, plate_path, raw_path, helper_func, cache_dir):
+    if cache_dir is not None:
+        # Skips Excel parsing when the files are unchanged since the last run
+        cached = LoadPlateFolder(plate_path, raw_path, cache_dir, replicate_func=GetReplicate)
+        plate_data = cached['plate']
+        raw_data = cached['raw']
+        replicate_data = cached['replicate']
+    else:
+        plate_data = ReadPlate(plate_path)
+        raw_data = ReadMARS(raw_path)
+        replicate_data = GetReplicate(plate_data)
+
+    # Apply helper function if provided
+    if helper_func:
+        plate_data = plate_data.apply(helper_func)
+
+    return {
+        'plate': plate_data,
+        'raw': raw_data,
+        'replicate': replicate_data
+    }
+
+
+def IterReadMARS(path, plate_subfix, raw_subfix, helper_func=None, cache_dir=None, n_threads=4, ordered=False):
+    """
+    Read MARS Folders Concurrently, Yielding Each Plate When Ready.
+
+    Folders are read by a bounded pool of threads, so the file I/O of some folders overlaps
+    the decoding of others. At most `2 * n_threads` folders are in flight, which bounds memory
+    when the consumer is slower than the reader. Folders without a matching plate or raw file
+    are skipped with a warning, as in the R version.
+
+    :param path: The path to the directory containing subfolders with MARS Excel files.
+    :param plate_subfix: A string that identifies plate data files.
+    :param raw_subfix: A string that identifies raw data files.
+    :param helper_func: An optional function applied to each column of the plate data.
+    :param cache_dir: Optional directory for the on-disk plate cache (see `LoadPlateFolder()`).
+    :param n_threads: Number of reader threads. Default is 4.
+    :param ordered: Boolean. If True, plates are yielded in folder order; otherwise as soon as they are read.
+    :return: A generator of `(folder_name, plate)` pairs, where plate is a dict with 'plate', 'raw' and 'replicate'.
+    """
+    folders = sorted(f for f in os.listdir(path) if os.path.isdir(os.path.join(path, f)))
+
+    jobs = []
+    for folder in folders:
+        folder_path = os.path.join(path, folder)
+        found = _find_files(folder_path, plate_subfix, raw_subfix)
+        if found is None:
+            warnings.warn(f"Skipping folder {folder_path} due to missing files.")
+            continue
+        jobs.append((folder, folder_path) + found)
+
+    if n_threads is None or n_threads <= 1:
+        for folder, folder_path, plate_path, raw_path in jobs:
+            yield folder, _read_folder(folder_path, plate_path, raw_path, helper_func, cache_dir)
+        return
+
+    pending = deque(jobs)
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        in_flight = {}
+        order = deque()
+
+        def submit():
+            while pending and len(in_flight) < 2 * n_threads:
+                folder, folder_path, plate_path, raw_path = pending.popleft()
+                future = executor.submit(_read_folder, folder_path, plate_path, raw_path, helper_func, cache_dir)
+                in_flight[future] = folder
+                order.append(future)
+
+        submit()
+        while in_flight:
+            if ordered:
+                future = order.popleft()
+                future.result()
+                done = [future]
+            else:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                folder = in_flight.pop(future)
+                if not ordered:
+                    order.remove(future)
+                yield folder, future.result()
+            submit()
+
+
+def BulkReadMARS(path, plate_subfix, raw_subfix, helper_func=None, cache_dir=None, n_threads=1):
+    """
+    Read Multiple MARS Excel Files.
+
+    This function reads plate data and raw data from MARS Excel files located in subfolders of a specified path.
+    It also generates replicate data for each plate. Folders missing a plate or raw file are skipped with a warning.
+
+    :param path: The path to the directory containing subfolders with MARS Excel files.
+    :param plate_subfix: A string that identifies plate data files.
+    :param raw_subfix: A string that identifies raw data files.
+    :param helper_func: An optional function applied to each column of the plate data.
+    :param cache_dir: Optional directory for the on-disk plate cache (see `LoadPlateFolder()`).
+    :param n_threads: Number of reader threads (see `IterReadMARS()`). Default is 1.
+    :return: A dict keyed by folder name, in folder order; each value is a dict with 'plate', 'raw' and 'replicate'.
+    """
+    return dict(IterReadMARS(path, plate_subfix, raw_subfix, helper_func=helper_func, cache_dir=cache_dir,
+                             n_threads=n_threads, ordered=True))
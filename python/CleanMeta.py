@@ -1,5 +1,7 @@
 import pandas as pd
 import numpy as np
+from PlateGeometry import GetPlateGeometry, plate_format_of
+from PlateLayout import cached_layout, layout_fingerprint
 
 def CleanMeta(raw, plate, replicate, split_content=False, split_by="_", split_into=None, del_na=True):
     """
@@ -7,6 +9,7 @@ def CleanMeta(raw, plate, replicate, split_content=False, split_by="_", split_in
     
     This function processes raw data, plate layout, and replicate information 
     to create a clean metadata dataframe. It can optionally split the content column into additional columns.
+    The metadata is built once per distinct layout and reused for plates sharing it (see `ClearLayoutCache()`).
     
     :param raw: A DataFrame containing the raw data.
     :param plate: A DataFrame containing the plate layout information.
@@ -19,42 +22,39 @@ def CleanMeta(raw, plate, replicate, split_content=False, split_by="_", split_in
     """
     if split_content and (split_into is None or len(split_into) == 0):
         raise ValueError("If split_content is True, split_into must be provided and cannot be empty.")
-    
-    n_platecol = 13 if plate.shape[1] == 13 else 25
-    plate_format = 96 if n_platecol == 13 else 384
+
+    # Plates sharing a layout share their metadata, which is built once per layout
+    params = {'split_content': split_content, 'split_by': split_by,
+              'split_into': list(split_into) if split_content else None, 'del_na': del_na}
+    meta = cached_layout('CleanMeta', layout_fingerprint(plate, replicate),
+                         lambda: _build_meta(plate, replicate, **params), params)
+    return meta.copy()
+
+
+def _build_meta(plate, replicate, split_content, split_by, split_into, del_na):
+    geometry = GetPlateGeometry(plate_format_of(plate))
+    plate_format = geometry.format
     
     replicate = replicate.iloc[:, 1:].values.flatten()
     
-    def generate_wells(rows, cols):
-        wells = [f"{r}{c}" for r in rows for c in cols]
-        return wells
+    well = geometry.well
     
-    if plate_format == 96:
-        rows = list("ABCDEFGH")
-        cols = [f"{i:02}" for i in range(1, 13)]
-        n_row, n_col = 8, 12
-    elif plate_format == 384:
-        rows = list("ABCDEFGHIJKLMNOP")
-        cols = [f"{i:02}" for i in range(1, 25)]
-        n_row, n_col = 16, 24
-    else:
-        raise ValueError("Invalid format. Must be either 96 or 384.")
-    
-    well = generate_wells(rows, cols)
-    
-    content = plate.iloc[:, 1:n_platecol].values.flatten()
+    content = plate.iloc[:, 1:geometry.n_col + 1].values.flatten()
     
     if del_na:
         valid_well = ~pd.isna(replicate)
-        well = np.array(well)[valid_well]
+        well = well[valid_well]
         content = content[valid_well]
         replicate = replicate[valid_well]
     
-    content_replicate = np.where(
-        (pd.isna(content)) | (pd.isna(replicate)),
-        np.nan,
-        content + "_" + replicate
-    )
+    # Whole numbers read from Excel as floats are written without the trailing ".0", as R's paste() does
+    def as_label(x):
+        return str(int(x)) if isinstance(x, float) and x.is_integer() else str(x)
+
+    content_replicate = np.array([
+        np.nan if pd.isna(c) or pd.isna(r) else f"{as_label(c)}_{as_label(r)}"
+        for c, r in zip(content, replicate)
+    ], dtype=object)
     
     meta = pd.DataFrame({
         'well': well,
@@ -1,66 +1,152 @@
-#' Generate Clean Raw Data
-#'
-#' @description This function takes metadata, raw data, and total cycle information to generate clean raw fluorescence data.
-#'
-#' @param meta A data frame containing the metadata. Output from CleanMeta function.
-#' @param raw Raw fluorescence readings from MARS software.
-#' @param plate_time Output of `ConvertTime()`.
-#' @param cycle_total The total number of cycles (rows) to include in the output.
-#' 
-#' @return A data frame containing the cleaned raw fluorescence data. 
-#' 
-#' @examples
-#' # Define the path to the plate data file
-#' plate_path <- system.file("extdata/20240716_p3", 
-#'                           file = '20240716_p3_plate.xlsx', 
-#'                           package = "QuICSeedR")
-#'   
-#' # Read the plate data
-#' plate <- readxl::read_xlsx(plate_path)
-#' 
-#' # Define the path to the raw data file
-#' raw_path <- system.file("extdata/20240716_p3", 
-#'                         file = '20240716_p3_raw.xlsx', 
-#'                         package = "QuICSeedR")
-#' # Read the raw data
-#' raw <- readxl::read_xlsx(raw_path)
-#' 
-#' # Get replicate data
-#' replicate <- GetReplicate(plate)
-#' 
-#' # Ensure time displayed as decimal hours
-#' plate_time = ConvertTime(raw)
-#' 
-#' #Get metadata and display the few rows 
-#' meta = CleanMeta(raw, plate, replicate)
-#' 
-#' #Clean data 
-#' cleaned_data <- CleanRaw(meta, raw, plate_time)
-#' 
-#' cleaned_data[1:5, 1:5]
-#' 
-#' @export
-import rpy2.robjects as ro
-
-ro.r('''
-CleanRaw = function (meta, raw, plate_time, cycle_total) 
-{
-    if (missing(cycle_total) || is.null(cycle_total) || length(cycle_total) == 
-        0) {
-        cycle_total = nrow(raw) - 1
-    }
-    else {
-        cycle_total <- cycle_total
-    }
-    raw = raw[-1, -c(1:2)]
-    raw = raw[1:cycle_total, meta$well]
-    raw = as.numeric(unlist(raw))
-    raw = matrix(raw, nrow = cycle_total)
-    rownames(raw) = unlist(plate_time[1:cycle_total, ])
-    colnames(raw) = meta$content_replicate
-    return(raw)
-}
-''')
-
-CleanRaw = ro.r['CleanRaw']
+from typing import NamedTuple
 
+import numpy as np
+import pandas as pd
+from PlateGeometry import GetPlateGeometry, well_positions
+from GetReplicate import _as_label
+from PlateLayout import cached_layout, layout_fingerprint
+from ReadMARS import MARSRaw
+
+
+class CleanedPlate:
+    """
+    Compact cleaned raw data of one plate, as returned by `CleanRaw(..., compact=True)`.
+
+    Fluorescence is held in one C-ordered matrix of a narrow dtype (float32 by default, which
+    stores MARS readings exactly and halves the memory of the DataFrame), and wells are described
+    by integer codes instead of `content_replicate` strings. Labels are only built by `to_frame()`.
+
+    :ivar values: Array of shape (cycles, wells).
+    :ivar time: Time of each cycle in hours, float64 of shape (cycles,).
+    :ivar well_code: Position of each well in `wells`.
+    :ivar wells: Well names; the plate geometry's wells when the format is known.
+    :ivar content_code: Position of each well's content in `contents`, -1 when missing.
+    :ivar contents: The contents, in order of first appearance.
+    :ivar replicate: Replicate number of each well, -1 when missing.
+    """
+
+    __slots__ = ('values', 'time', 'well_code', 'wells', 'content_code', 'contents', 'replicate')
+
+    def __init__(self, values, time, well_code, wells, content_code, contents, replicate, dtype=np.float32):
+        self.values = np.ascontiguousarray(values, dtype=dtype)
+        self.time = np.asarray(time, dtype=float)
+        self.well_code = np.asarray(well_code, dtype=np.int32)
+        self.wells = np.asarray(wells)
+        self.content_code = np.asarray(content_code, dtype=np.int32)
+        self.contents = np.asarray(contents, dtype=object)
+        self.replicate = np.asarray(replicate, dtype=np.int32)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.__slots__)
+
+    @property
+    def well(self):
+        """Well name of each column."""
+        return self.wells[self.well_code]
+
+    def labels(self):
+        """The `content_replicate` label of each column, as built by `CleanMeta()`."""
+        return np.array([
+            np.nan if c < 0 or r < 0 else f"{_as_label(self.contents[c])}_{r}"
+            for c, r in zip(self.content_code, self.replicate)
+        ], dtype=object)
+
+    def to_frame(self, dtype=float):
+        """
+        Convert to the DataFrame returned by `CleanRaw()`.
+
+        :param dtype: dtype of the values. Default is float64, as `CleanRaw()` returns.
+        """
+        return pd.DataFrame(self.values.astype(dtype, copy=False), index=self.time, columns=self.labels())
+
+
+class CleaningIndex(NamedTuple):
+    """Where the wells of a plate's metadata are in its raw export, and their codes for `CleanedPlate`."""
+    position: np.ndarray      # column of each meta well in the raw values
+    well_code: np.ndarray
+    wells: np.ndarray
+    content_code: np.ndarray
+    contents: np.ndarray
+    replicate: np.ndarray
+
+
+def _build_index(meta, wells):
+    if 'format' in meta.columns and len(meta) > 0:
+        geometry = GetPlateGeometry(meta['format'].iloc[0])
+        position = well_positions(meta['well'], wells, geometry)
+        well_code, well_names = geometry.well_index.get_indexer(meta['well']), geometry.well
+    else:
+        position = pd.Index(wells).get_indexer(meta['well'])
+        well_code, well_names = position, np.asarray(wells)
+    if (position < 0).any():
+        missing = list(meta['well'][position < 0])
+        raise KeyError(f"Wells not found in raw data: {missing}")
+
+    content_code, contents = pd.factorize(meta['content'])
+    replicate = meta['replicate'].to_numpy(dtype=float)
+    index = CleaningIndex(position, well_code.astype(np.int32), well_names, content_code.astype(np.int32),
+                          np.asarray(contents, dtype=object),
+                          np.where(np.isnan(replicate), -1, replicate).astype(np.int32))
+    for array in index:
+        # Shared by every plate with this layout, so keep them read-only
+        array.flags.writeable = False
+    return index
+
+
+def _cleaning_index(meta, wells):
+    # Built once per distinct layout and raw well order
+    fingerprint = layout_fingerprint(meta, wells)
+    return cached_layout('CleanRaw', fingerprint, lambda: _build_index(meta, wells))
+
+
+def CleanRaw(meta, raw, plate_time, cycle_total=None, compact=False, dtype=np.float32):
+    """
+    Generate Clean Raw Data.
+
+    This function takes metadata, raw data, and total cycle information to generate clean raw fluorescence data.
+
+    :param meta: A DataFrame containing the metadata. Output from `CleanMeta()`.
+    :param raw: Raw fluorescence readings from MARS software, as a DataFrame or the output of `ReadMARS()`.
+    :param plate_time: Output of `ConvertTime()`.
+    :param cycle_total: The total number of cycles (rows) to include in the output. Default is all cycles.
+    :param compact: Boolean. If True, return a `CleanedPlate` instead of a DataFrame. Default is False.
+    :param dtype: dtype of the `CleanedPlate` values. Default is float32.
+    :return: A DataFrame containing the cleaned raw fluorescence data, indexed by time,
+             with one column per well named by `content_replicate`, or a `CleanedPlate` if compact.
+    """
+    if isinstance(raw, MARSRaw):
+        wells = raw.well
+    else:
+        wells = raw.columns[2:]
+
+    index = _cleaning_index(meta, wells)
+    position = index.position
+
+    if isinstance(raw, MARSRaw):
+        values = raw.values
+        if cycle_total is None or cycle_total == 0:
+            cycle_total = values.shape[0]
+        # Select only the cycles specified by cycle_total and the wells from the metadata
+        values = values[:cycle_total, position]
+    else:
+        if cycle_total is None or cycle_total == 0:
+            cycle_total = raw.shape[0] - 1
+        # Remove the first row and the first two columns; only the selected wells are converted
+        values = raw.iloc[1:cycle_total + 1, position + 2].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+
+    row_names = plate_time.iloc[:cycle_total, 0].to_numpy()
+
+    if compact:
+        return CleanedPlate(
+            values, pd.to_numeric(pd.Series(row_names), errors='coerce').to_numpy(dtype=float),
+            index.well_code, index.wells, index.content_code, index.contents, index.replicate, dtype=dtype,
+        )
+
+    cleaned_raw = pd.DataFrame(values, index=row_names, columns=meta['content_replicate'].to_numpy())
+
+    return cleaned_raw
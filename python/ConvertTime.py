@@ -1,39 +1,24 @@
 import pandas as pd
-import re
+from ReadMARS import MARSRaw
+from TimeFormat import parse_time
 
-def ConvertTime(raw):
+def ConvertTime(raw, time_format=None):
     """
     Extract and Convert Time Data to Decimal Hours.
-    
+
     This function extracts and converts run time information from MARS output.
-    
-    :param raw: A DataFrame containing the MARS output.
+    The format ("X h Y min", minutes, seconds or decimal hours) is detected once per header
+    signature and the whole column is parsed in one pass; see `parse_time()` for the array.
+
+    :param raw: A DataFrame containing the MARS output, or the output of `ReadMARS()`.
+    :param time_format: 'units', 'hours', 'minutes' or 'seconds'. Default is to detect it.
     :return: A DataFrame containing the time information in decimal hours.
     """
-    # Extract time column, skipping the header row
-    time = raw.iloc[1:, 1].values.flatten()
-    time = pd.DataFrame(time, columns=['.'])
-    
-    # Check if any values contain "min" (indicating "hours and minutes" format)
-    if time['.'].str.contains("min", regex=False).any():
-        # Extract hours and convert to numeric
-        time['hours'] = time['.'].apply(lambda x: float(re.search(r"(\d+)\s*h", x).group(1)) if 'h' in x else 0)
-        
-        # Extract minutes and convert to numeric
-        time['minutes'] = time['.'].apply(lambda x: float(re.search(r"(\d+)\s*min", x).group(1)) if 'min' in x else 0)
-        
-        # Calculate decimal hours
-        time['.'] = time['hours'] + (time['minutes'] / 60)
-        
-        # Drop auxiliary columns used for calculation
-        time = time[['.']]
-    else:
-        # Convert to numeric if it's already in decimal hours format
-        time['.'] = pd.to_numeric(time['.'], errors='coerce')
-    
-    return time
-
-
-df = pd.read_excel('./tutorials/data/20240716_s1_raw.xlsx')
+    if isinstance(raw, MARSRaw):
+        if time_format is None:
+            return pd.DataFrame({'.': raw.time})
+        return pd.DataFrame({'.': parse_time(raw.time_label, raw.time_header, time_format)})
 
-print(df.head())
\ No newline at end of file
+    # Time column, skipping the header row; cells can be numbers or "X h Y min" strings
+    time = parse_time(raw.iloc[1:, 1].to_numpy(dtype=object), header=raw.iloc[0, 1], time_format=time_format)
+    return pd.DataFrame({'.': time})
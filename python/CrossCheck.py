@@ -0,0 +1,107 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+from ReadMARS import MARSRaw
+
+# Columns compared between the Python and R outputs, and the keys used to line rows up
+_COMPARED = {
+    'combined_calculation': (['content_replicate'], ['time_to_threshold', 'RAF', 'MPR', 'MS', 'XTH']),
+    'combined_result': (['content'], ['xth_count', 'total_rep', 'xth_percent', 'metric_count',
+                                      'RAF_p', 'MPR_p', 'MS_p', 'time_to_threshold_p']),
+}
+
+
+def _to_r(ro, pandas2ri, value):
+    # Stage parameters are nested dicts of scalars and lists; R expects named lists and vectors
+    if isinstance(value, dict):
+        return ro.ListVector({k: _to_r(ro, pandas2ri, v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        if all(isinstance(v, str) for v in value):
+            return ro.StrVector(value)
+        return ro.FloatVector(value)
+    if isinstance(value, pd.DataFrame):
+        return pandas2ri.py2rpy(value)
+    return value
+
+
+def _raw_for_r(raw):
+    # readxl reads the export as text columns (the first row holds the contents), so R gets strings
+    frame = raw.to_frame() if isinstance(raw, MARSRaw) else raw
+    return frame.map(lambda v: None if pd.isna(v) else str(v))
+
+
+def CrossCheck(data, params=None, n_plates=3, seed=None, do_analysis=True, processed=None, rtol=1e-6, atol=1e-8):
+    """
+    Compare the Python pipeline against the QuICSeedR R package on a sample of plates.
+
+    Requires rpy2 and the QuICSeedR R package; neither is imported until this function runs.
+
+    :param data: Output of `BulkReadMARS()`.
+    :param params: The `params` dict passed to `BulkProcessing()`.
+    :param n_plates: Number of plates to re-run through R. Default is 3.
+    :param seed: Seed for choosing the plates. Default is None.
+    :param do_analysis: Boolean, passed to both pipelines. Default is True.
+    :param processed: Output of the Python `BulkProcessing()` for `data`. Computed for the sampled plates if None.
+    :param rtol: Relative tolerance for numeric columns.
+    :param atol: Absolute tolerance for numeric columns.
+    :return: A DataFrame with one row per plate, table and column: 'plate_name', 'table', 'column',
+             'n_compared', 'n_mismatch' and 'max_abs_diff'.
+    """
+    import rpy2.robjects as ro
+    from rpy2.robjects import conversion, default_converter, pandas2ri
+    from rpy2.robjects.packages import importr
+
+    if params is None:
+        params = {}
+
+    names = list(data.keys()) if isinstance(data, dict) else list(range(len(data)))
+    names = random.Random(seed).sample(names, min(n_plates, len(names)))
+    subset = {name: data[name] for name in names}
+
+    if processed is None:
+        from BulkProcessing import BulkProcessing
+        processed = BulkProcessing(subset, do_analysis=do_analysis, params=params)
+
+    quicseedr = importr('QuICSeedR')
+    with conversion.localconverter(default_converter + pandas2ri.converter):
+        r_data = ro.ListVector({
+            str(name): ro.ListVector({
+                'plate': pandas2ri.py2rpy(experiment['plate']),
+                'raw': pandas2ri.py2rpy(_raw_for_r(experiment['raw'])),
+                'replicate': pandas2ri.py2rpy(experiment['replicate']),
+            })
+            for name, experiment in subset.items()
+        })
+        r_out = quicseedr.BulkProcessing(r_data, do_analysis=do_analysis, params=_to_r(ro, pandas2ri, params))
+        r_tables = {table: conversion.get_conversion().rpy2py(r_out.rx2(table)) for table in _COMPARED}
+
+    rows = []
+    for table, (keys, columns) in _COMPARED.items():
+        py_table = processed[table] if processed is not None else pd.DataFrame()
+        r_table = r_tables[table]
+        for name in names:
+            py_plate = py_table[py_table['plate_name'] == name].set_index(keys)
+            r_plate = r_table[r_table['plate_name'].astype(str) == str(name)].set_index(keys)
+            py_plate.index = py_plate.index.astype(str)
+            r_plate.index = r_plate.index.astype(str)
+            shared = py_plate.index.intersection(r_plate.index)
+
+            for column in columns:
+                if column not in py_plate.columns or column not in r_plate.columns:
+                    continue
+                py_values = pd.to_numeric(py_plate.loc[shared, column], errors='coerce').to_numpy(dtype=float)
+                r_values = pd.to_numeric(r_plate.loc[shared, column], errors='coerce').to_numpy(dtype=float)
+                close = np.isclose(py_values, r_values, rtol=rtol, atol=atol, equal_nan=True)
+                diff = np.abs(py_values - r_values)
+                rows.append({
+                    'plate_name': name,
+                    'table': table,
+                    'column': column,
+                    'n_compared': len(shared),
+                    'n_mismatch': int((~close).sum()),
+                    'max_abs_diff': float(np.nanmax(diff)) if np.isfinite(diff).any() else 0.0,
+                })
+
+    return pd.DataFrame(rows, columns=['plate_name', 'table', 'column', 'n_compared', 'n_mismatch', 'max_abs_diff'])
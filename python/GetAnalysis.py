@@ -0,0 +1,306 @@
+import functools
+import re
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+TESTS = ("t-test", "wilcox", "yuen")
+
+
+@functools.lru_cache(maxsize=None)
+def _wilcox_cdf(m, n):
+    # Exact null CDF of the rank-sum statistic W, from the generating function
+    # prod_{i=1..m} (1 - q^(n+i)) / (1 - q^i); integer arithmetic keeps large counts exact
+    size = m * n + 1
+    c = [0] * size
+    c[0] = 1
+    for i in range(1, m + 1):
+        k = n + i
+        for u in range(size - 1, k - 1, -1):
+            c[u] -= c[u - k]
+        for u in range(i, size):
+            c[u] += c[u - i]
+    total = sum(c)
+    return np.array([float(v) / total for v in np.cumsum(np.array(c, dtype=object))])
+
+
+def _columns(x):
+    # Samples as the columns of a 2-D float array, NaN-padded; a 1-D input is one sample
+    x = np.asarray(x, dtype=float)
+    return x[:, None] if x.ndim == 1 else x
+
+
+def _unwrap(statistic, p, x):
+    if np.ndim(x) == 1:
+        return float(statistic[0]), float(p[0])
+    return statistic, p
+
+
+def wilcox_test(x, y, alternative="two.sided"):
+    """
+    Wilcoxon rank-sum test, following `stats::wilcox.test()` with its default settings.
+
+    Every column of `x` is tested against `y` at once. The rank sum of a column only depends on
+    where its values fall in the sorted control, so W is a sum of `searchsorted()` counts and no
+    combined ranking is built per column. The exact distribution is used when both samples have
+    fewer than 50 values and there are no ties; otherwise the normal approximation with
+    continuity correction is used.
+
+    :param x: One sample, or a 2-D array with one sample per column (NaN-padded).
+    :param y: The control sample.
+    :return: A tuple (statistic, p_value), where statistic is R's W; arrays when `x` is 2-D.
+    """
+    X = _columns(x)
+    y = np.asarray(y, dtype=float).ravel()
+    y = np.sort(y[np.isfinite(y)])
+    valid = np.isfinite(X)
+    nx = valid.sum(axis=0)
+    ny = len(y)
+    if (nx < 1).any():
+        raise ValueError("not enough (non-missing) 'x' observations")
+    if ny < 1:
+        raise ValueError("not enough 'y' observations")
+
+    Xv = np.where(valid, X, 0.0)
+    less = np.searchsorted(y, Xv, side='left')
+    equal = np.searchsorted(y, Xv, side='right') - less
+    statistic = np.where(valid, less + 0.5 * equal, 0.0).sum(axis=0)
+
+    # Copies of each x value within its own column
+    same = ((X[:, None, :] == X[None, :, :]) & valid[:, None, :] & valid[None, :, :]).sum(axis=1)
+    _, y_counts = np.unique(y, return_counts=True)
+    y_ties = np.sum(y_counts ** 3 - y_counts)
+    total = equal + same
+    # Tie groups that contain x values, counted once per group by dividing by the x copies
+    x_ties = np.where(valid, ((total ** 3 - total) - (equal ** 3 - equal)) / np.maximum(same, 1), 0.0).sum(axis=0)
+    tie_sum = y_ties + x_ties
+    ties = (tie_sum > 0)
+
+    p = np.empty(X.shape[1])
+    exact = (nx < 50) & (ny < 50) & ~ties
+    for n in np.unique(nx[exact]):
+        cols = np.flatnonzero(exact & (nx == n))
+        cdf = _wilcox_cdf(int(n), ny)
+        w = np.rint(statistic[cols]).astype(int)
+        lower = cdf[w]
+        upper = np.where(w > 0, 1 - cdf[np.maximum(w - 1, 0)], 1.0)
+        if alternative == "two.sided":
+            p[cols] = np.minimum(2 * np.where(statistic[cols] > n * ny / 2, upper, lower), 1.0)
+        elif alternative == "greater":
+            p[cols] = upper
+        else:
+            p[cols] = lower
+
+    approx = ~exact
+    if approx.any():
+        n = nx[approx]
+        z = statistic[approx] - n * ny / 2
+        sigma = np.sqrt(n * ny / 12 * ((n + ny + 1) - tie_sum[approx] / ((n + ny) * (n + ny - 1))))
+        if alternative == "two.sided":
+            correction = np.sign(z) * 0.5
+        elif alternative == "greater":
+            correction = 0.5
+        else:
+            correction = -0.5
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = (z - correction) / sigma
+        if alternative == "two.sided":
+            p[approx] = 2 * np.minimum(stats.norm.cdf(z), stats.norm.sf(z))
+        elif alternative == "greater":
+            p[approx] = stats.norm.sf(z)
+        else:
+            p[approx] = stats.norm.cdf(z)
+
+    return _unwrap(statistic, p, x)
+
+
+def t_test(x, y, alternative="two.sided"):
+    """
+    Welch two-sample t-test, following `stats::t.test()` with its default settings.
+
+    Every column of `x` is tested against `y` at once. Where R's t.test() would stop with an
+    error (fewer than two values, or essentially constant data) the statistic and p-value are NaN.
+
+    :param x: One sample, or a 2-D array with one sample per column (NaN-padded).
+    :param y: The control sample.
+    :return: A tuple (statistic, p_value); arrays when `x` is 2-D.
+    """
+    X = _columns(x)
+    y = np.asarray(y, dtype=float).ravel()
+    y = y[~np.isnan(y)]
+    valid = ~np.isnan(X)
+    nx = valid.sum(axis=0)
+    ny = len(y)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mx = np.where(valid, X, 0.0).sum(axis=0) / nx
+        vx = np.where(valid, (X - mx) ** 2, 0.0).sum(axis=0) / (nx - 1)
+        my = y.mean() if ny else np.nan
+        vy = y.var(ddof=1) if ny > 1 else np.nan
+        stderrx2 = vx / nx
+        stderry2 = vy / ny
+        stderr = np.sqrt(stderrx2 + stderry2)
+        df = stderr ** 4 / (stderrx2 ** 2 / (nx - 1) + stderry2 ** 2 / (ny - 1))
+        statistic = (mx - my) / stderr
+
+    # "not enough observations" and "data are essentially constant"
+    skip = (nx < 2) | (ny < 2) | (stderr < 10 * np.finfo(float).eps * np.maximum(np.abs(mx), abs(my)))
+    statistic = np.where(skip, np.nan, statistic)
+
+    if alternative == "two.sided":
+        p = 2 * stats.t.cdf(-np.abs(statistic), df)
+    elif alternative == "greater":
+        p = stats.t.sf(statistic, df)
+    else:
+        p = stats.t.cdf(statistic, df)
+    return _unwrap(statistic, np.where(skip, np.nan, p), x)
+
+
+def _trimmed_stats(X, tr):
+    # Trimmed mean, winsorized variance and effective size h of every column (NaN-padded)
+    Xs = np.sort(X, axis=0)
+    n = (~np.isnan(Xs)).sum(axis=0)
+    g = np.floor(tr * n).astype(int)
+    idx = np.arange(Xs.shape[0])[:, None]
+    valid = idx < n
+    kept = (idx >= g) & (idx < n - g)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        trimmed_mean = np.where(kept, Xs, 0.0).sum(axis=0) / kept.sum(axis=0)
+        lo = np.take_along_axis(Xs, np.clip(g, 0, Xs.shape[0] - 1)[None, :], axis=0)[0]
+        hi = np.take_along_axis(Xs, np.clip(n - g - 1, 0, Xs.shape[0] - 1)[None, :], axis=0)[0]
+        win = np.where(valid, np.clip(Xs, lo, hi), 0.0)
+        win_mean = win.sum(axis=0) / n
+        win_var = np.where(valid, (win - win_mean) ** 2, 0.0).sum(axis=0) / (n - 1)
+    return n, n - 2 * g, trimmed_mean, win_var
+
+
+def yuen_test(x, y, alternative="two.sided", tr=0.1):
+    """
+    Yuen's test for trimmed means, following `WRS2::yuen()` as wrapped by the R GetAnalysis.
+
+    Every column of `x` is tested against `y` at once. WRS2 reports the absolute test statistic,
+    so a one-sided 'greater' test halves the two-sided p-value whenever the statistic is positive
+    and 'less' keeps it unchanged.
+
+    :param x: One sample, or a 2-D array with one sample per column (NaN-padded).
+    :param y: The control sample.
+    :return: A tuple (statistic, p_value); arrays when `x` is 2-D.
+    """
+    X = _columns(x)
+    n1, h1, m1, v1 = _trimmed_stats(X, tr)
+    n2, h2, m2, v2 = _trimmed_stats(np.asarray(y, dtype=float).reshape(-1, 1), tr)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        q1 = (n1 - 1) * v1 / (h1 * (h1 - 1))
+        q2 = (n2 - 1) * v2 / (h2 * (h2 - 1))
+        df = (q1 + q2) ** 2 / (q1 ** 2 / (h1 - 1) + q2 ** 2 / (h2 - 1))
+        statistic = np.abs((m1 - m2) / np.sqrt(q1 + q2))
+    p = 2 * (1 - stats.t.cdf(statistic, df))
+
+    if alternative == "greater":
+        p = np.where(statistic > 0, p / 2, p)
+    return _unwrap(statistic, p, x)
+
+
+def p_adjust_bh(p, n=None):
+    """
+    Benjamini-Hochberg adjustment, following `stats::p.adjust(p, method = "BH")`.
+
+    Missing p-values count as comparisons: the finite p-values are ranked among themselves and
+    adjusted against `n = len(p)`, and NaN stays NaN.
+
+    :param p: The p-values.
+    :param n: Number of comparisons. Default is `len(p)`, missing values included.
+    """
+    p = np.asarray(p, dtype=float)
+    adjusted = np.full(p.shape, np.nan)
+    valid = ~np.isnan(p)
+    if n is None:
+        n = p.size
+    n_valid = int(valid.sum())
+    if n < n_valid:
+        raise ValueError("n must be at least the number of non-missing p-values")
+    if n_valid == 0:
+        return adjusted
+    pv = p[valid]
+    order = np.argsort(-pv, kind="stable")
+    ranks = np.arange(n_valid, 0, -1)
+    adjusted_sorted = np.minimum(1, np.minimum.accumulate(n / ranks * pv[order]))
+    out = np.empty(n_valid)
+    out[order] = adjusted_sorted
+    adjusted[valid] = out
+    return adjusted
+
+
+def significance_stars(p, alpha=0.05):
+    """
+    Significance stars for each p-value: '****' <= 0.0001, '***' <= 0.001, '**' <= 0.01,
+    '*' <= alpha and '' otherwise or when the p-value is missing.
+    """
+    p = np.asarray(p, dtype=float)
+    with np.errstate(invalid="ignore"):
+        return np.select(
+            [p <= 0.0001, p <= 0.001, p <= 0.01, p <= alpha],
+            ['****', '***', '**', '*'],
+            default=''
+        ).astype(object)
+
+
+def GetAnalysis(calculation_spread, control, test='wilcox', alternative='two.sided', adjust_p=False, alpha=0.05):
+    """
+    Perform Statistical Analysis on Calculations.
+
+    This function performs statistical analysis on a dict of calculation spreads,
+    comparing each column to a control column using various statistical tests.
+
+    :param calculation_spread: A dict of DataFrames, each representing a calculation spread. Output of `SpreadCalculation()`.
+    :param control: The name or regular expression pattern of the control column in each DataFrame.
+    :param test: The statistical test to use: 't-test' (Welch's t-test), 'wilcox' (Wilcoxon rank-sum test)
+                 or 'yuen' (Yuen's test for 10% trimmed means). Default is 'wilcox'.
+    :param alternative: Options are 'two.sided', 'less', or 'greater'. Default is 'two.sided'.
+    :param adjust_p: Boolean. Whether to adjust p-values for multiple comparisons (Benjamini-Hochberg). Default is False.
+    :param alpha: The significance level for determining significance stars. Default is 0.05.
+    :return: A dict of DataFrames indexed by content with 'statistic', 'p_value', 'adj_p' (only if adjust_p)
+             and 'significant' columns, keyed like `calculation_spread`.
+    """
+    if test == "t-test":
+        test_fun = t_test
+    elif test == "wilcox":
+        test_fun = wilcox_test
+    elif test == "yuen":
+        test_fun = yuen_test
+    else:
+        raise ValueError("Invalid test specified")
+
+    analysis = {}
+
+    for name, data in calculation_spread.items():
+        # A view of the spread array when it comes from SpreadCalculation()
+        values = data.to_numpy(dtype=float)
+        if name == "time_to_threshold":
+            values = np.nan_to_num(values, nan=0.0)
+
+        ct_sel = [i for i, col in enumerate(data.columns) if re.search(control, str(col))]
+        control_values = values[:, ct_sel].ravel()
+
+        stat_res = pd.DataFrame(np.nan, index=data.columns, columns=['statistic', 'p_value', 'adj_p'])
+
+        # All columns are tested against the control in one call
+        statistic, p_value = test_fun(values, control_values, alternative=alternative)
+        stat_res['statistic'] = np.round(statistic, 2)
+        stat_res['p_value'] = np.round(p_value, 5)
+
+        if adjust_p:
+            stat_res['adj_p'] = np.round(p_adjust_bh(stat_res['p_value']), 5)
+        else:
+            stat_res['adj_p'] = stat_res['p_value']
+
+        stat_res['significant'] = significance_stars(stat_res['adj_p'], alpha)
+
+        if not adjust_p:
+            stat_res = stat_res.drop(columns='adj_p')
+        analysis[name] = stat_res
+
+    return analysis
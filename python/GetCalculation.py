@@ -0,0 +1,330 @@
+import inspect
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from CleanRaw import CleanedPlate
+
+THRESHOLD_METHODS = ("stdv", "bg_ratio", "rfu_val")
+
+
+def calculate_mpr(raw, background):
+    """
+    Max Point Ratio of every well.
+
+    :param raw: Array of shape (..., cycles, wells).
+    :param background: Array of shape (..., wells) holding the background cycle.
+    :return: Array of shape (..., wells).
+    """
+    return raw.max(axis=-2) / background
+
+
+def calculate_threshold(nv, method, sd_fold, bg_fold, rfu):
+    """
+    Fluorescence threshold used for time to threshold and RAF.
+
+    :param nv: Background cycle values, shape (..., wells).
+    :param method: One of 'stdv', 'bg_ratio' or 'rfu_val'.
+    :return: Array broadcastable against (..., wells). 'stdv' gives one value
+             per plate, 'bg_ratio' one value per well.
+    """
+    if method == "stdv":
+        return nv.mean(axis=-1, keepdims=True) + sd_fold * nv.std(axis=-1, ddof=1, keepdims=True)
+    elif method == "bg_ratio":
+        return nv * bg_fold
+    else:
+        return np.full(nv.shape[:-1] + (1,), float(rfu))
+
+
+def calculate_raf(raw, time, threshold, time_skip):
+    """
+    Time to threshold and Rate of Amyloid Formation of every well.
+
+    :param raw: Array of shape (..., cycles, wells).
+    :param time: Time of each cycle in hours, shape (cycles,) or (..., cycles).
+    :param threshold: Output of `calculate_threshold()`.
+    :param time_skip: Number of initial cycles ignored when looking for the crossing. As in R, 0 still
+                      ignores the first cycle and reports the cycle before the crossing.
+    :return: A tuple (time_to_threshold, raf), each of shape (..., wells).
+    """
+    # R searches column[-(1:time_skip)], which drops the first cycle even when time_skip is 0, and
+    # reports rownames(raw)[crossing_row + time_skip], one cycle early in that case
+    skip = max(int(time_skip), 1)
+    if skip >= raw.shape[-2]:
+        # Nothing left to search: no well crosses, as R's which() finds nothing
+        shape = raw.shape[:-2] + raw.shape[-1:]
+        return np.full(shape, np.nan), np.zeros(shape)
+    above = raw[..., skip:, :] > np.expand_dims(threshold, -2)
+    crossed = above.any(axis=-2)
+    first = above.argmax(axis=-2) + int(time_skip)
+
+    time = np.broadcast_to(time, raw.shape[:-1])
+    time_to_threshold = np.take_along_axis(time, first, axis=-1)
+    time_to_threshold = np.where(crossed, time_to_threshold, np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        raf = 1 / time_to_threshold
+    raf[~np.isfinite(raf)] = 0
+    return time_to_threshold, raf
+
+
+def calculate_ms(raw, binw):
+    """
+    Max Slope of every well, using a bin of `binw` cycles.
+
+    :param raw: Array of shape (..., cycles, wells).
+    :param binw: Bin width in cycles.
+    :return: Array of shape (..., wells).
+    """
+    # Dividing after the max gives the same result, as the division by binw is monotonic.
+    # fmax skips NaN like max(na.rm = TRUE); an all-NaN well gives -Inf as in R
+    rise = np.fmax.reduce(raw[..., binw:, :] - raw[..., :-binw, :], axis=-2, initial=-np.inf)
+    return rise.astype(float) / binw
+
+
+def calculate_metrics(raw, time, threshold_method="stdv", time_skip=5, sd_fold=3, bg_fold=3,
+                      rfu=5000, cycle_background=4, binw=6):
+    """
+    Compute all GetCalculation metrics on one plate or a stack of plates.
+
+    :param raw: Fluorescence array of shape (cycles, wells) for a single plate,
+                or (plates, cycles, wells) for plates sharing the same number of cycles.
+    :param time: Time of each cycle in hours, shape (cycles,) or (plates, cycles).
+    :param threshold_method: Method for calculating threshold ('stdv', 'rfu_val', or 'bg_ratio').
+    :param time_skip: Number of initial time points to skip when checking for threshold crossing.
+    :param sd_fold: Fold of standard deviation to calculate the threshold for RAF (for 'stdv' method).
+    :param bg_fold: Background fold for threshold calculation (for 'bg_ratio' method).
+    :param rfu: Relative fluorescence unit values used for threshold (for 'rfu_val' method).
+    :param cycle_background: The cycle number (1-based) chosen as the background for RAF and MPR calculations.
+    :param binw: Bin width for the MS calculation.
+    :return: A dict of arrays of shape (..., wells) keyed by 'time_to_threshold', 'RAF', 'MPR' and 'MS'.
+    """
+    if threshold_method not in THRESHOLD_METHODS:
+        raise ValueError("Invalid threshold_method. Use 'stdv', 'bg_ratio', or 'rfu_val'.")
+
+    # float32 matrices (see `CleanedPlate`) are kept as they are; the threshold and the
+    # metrics are still computed in float64
+    raw = np.asarray(raw)
+    if raw.dtype.kind != 'f':
+        raw = raw.astype(float)
+    time = np.asarray(time, dtype=float)
+    n_cycle = raw.shape[-2]
+
+    if cycle_background > n_cycle:
+        raise ValueError("cycle_background exceeds number of rows in raw data")
+    if binw < 1 or binw >= n_cycle:
+        raise ValueError("binw must be at least 1 and smaller than the number of cycles")
+
+    background = raw[..., cycle_background - 1, :].astype(float)
+    threshold = calculate_threshold(background, threshold_method, sd_fold, bg_fold, rfu)
+    time_to_threshold, raf = calculate_raf(raw, time, threshold, time_skip)
+
+    return {
+        'time_to_threshold': time_to_threshold,
+        'RAF': raf,
+        'MPR': calculate_mpr(raw, background),
+        'MS': calculate_ms(raw, binw),
+    }
+
+
+def GetCalculation(raw, meta, norm=False, norm_ct=None, threshold_method="stdv", time_skip=5,
+                   sd_fold=3, bg_fold=3, rfu=5000, cycle_background=4, binw=6):
+    """
+    Perform Calculations.
+
+    This function takes cleaned raw data and performs various analyses, including calculating
+    the time to threshold, Rate of Amyloid Formation (RAF), Max Point Ratio (MPR),
+    Max Slope (MS), and whether the reaction crosses the threshold (XTH).
+    All wells are computed at once; see `calculate_metrics()` to run several plates in one call.
+
+    :param raw: Cleaned raw data. Output from `CleanRaw()`, with the time in hours as the index,
+                or a `CleanedPlate`.
+    :param meta: Cleaned meta data. Output from `CleanMeta()`.
+    :param norm: Boolean. If True, normalization will be performed. Default is False.
+    :param norm_ct: Sample name used to normalize calculation.
+    :param threshold_method: Method for calculating threshold ('stdv', 'rfu_val', or 'bg_ratio').
+    :param time_skip: Number of initial time points to skip when checking for threshold crossing.
+                      As in the R version, 0 still skips the first cycle and reports the time of the
+                      cycle before the crossing.
+    :param sd_fold: Fold of standard deviation to calculate the threshold for RAF (for 'stdv' method).
+    :param bg_fold: Background fold for threshold calculation (for 'bg_ratio' method).
+    :param rfu: Relative fluorescence unit values used for threshold (for 'rfu_val' method).
+    :param cycle_background: The cycle number chosen as the background for RAF and MPR calculations.
+    :param binw: Bin width for the MS calculation.
+    :return: A DataFrame containing the results of the calculation.
+    """
+    if norm and norm_ct is None:
+        raise ValueError("norm_ct must be provided when norm is True")
+
+    if isinstance(raw, CleanedPlate):
+        values, time = raw.values, raw.time
+    else:
+        values = raw.to_numpy(dtype=float)
+        time = pd.to_numeric(pd.Series(raw.index), errors="coerce").to_numpy(dtype=float)
+    metrics = calculate_metrics(
+        values, time,
+        threshold_method=threshold_method, time_skip=time_skip, sd_fold=sd_fold,
+        bg_fold=bg_fold, rfu=rfu, cycle_background=cycle_background, binw=binw
+    )
+    return metrics_to_frame(metrics, meta, norm=norm, norm_ct=norm_ct)
+
+
+def metrics_to_frame(metrics, meta, norm=False, norm_ct=None):
+    """
+    Attach the metrics of one plate to its metadata, as returned by `GetCalculation()`.
+
+    :param metrics: A dict of arrays of shape (wells,), as returned by `calculate_metrics()`.
+    :param meta: Cleaned meta data, one row per well in the same order.
+    :param norm: Boolean. If True, every metric is divided by its mean over the `norm_ct` wells.
+    :param norm_ct: Sample name used to normalize calculation.
+    :return: A DataFrame with the meta columns followed by the metrics and XTH.
+    """
+    if norm and norm_ct is None:
+        raise ValueError("norm_ct must be provided when norm is True")
+
+    calculation = pd.DataFrame(metrics)
+
+    if norm:
+        sel = (meta['content'] == norm_ct).to_numpy()
+        calculation = calculation / calculation[sel].mean(skipna=False)
+
+    calculation = pd.concat([meta.reset_index(drop=True), calculation], axis=1)
+    calculation['XTH'] = (calculation['time_to_threshold'] > 0).astype(int)
+
+    return calculation
+
+
+SWEEP_PARAMS = ("threshold_method", "time_skip", "sd_fold", "bg_fold", "rfu", "cycle_background", "binw")
+
+
+def _param_sets(grid):
+    # A dict of lists is expanded to every combination; a list of dicts is taken as is
+    if isinstance(grid, dict):
+        values = [v if isinstance(v, (list, tuple, np.ndarray)) else [v] for v in grid.values()]
+        param_sets = [dict(zip(grid, combo)) for combo in itertools.product(*values)]
+    else:
+        param_sets = [dict(p) for p in grid]
+    if not param_sets:
+        raise ValueError("grid has no parameter sets")
+
+    unknown = sorted({key for p in param_sets for key in p} - set(SWEEP_PARAMS))
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {unknown}. Must be among: {', '.join(SWEEP_PARAMS)}")
+
+    defaults = {name: parameter.default for name, parameter in
+                inspect.signature(calculate_metrics).parameters.items() if name in SWEEP_PARAMS}
+    return [{**defaults, **p} for p in param_sets]
+
+
+def sweep_metrics(raw, time, param_sets):
+    """
+    Compute the GetCalculation metrics of one plate for many parameter sets at once.
+
+    The running maximum of every well is built once per `time_skip`, and the crossing cycle of
+    all thresholds is then found with one `searchsorted()` per well, since the first cycle above
+    a threshold is the first cycle whose running maximum is above it. MPR is computed once per
+    `cycle_background` and MS once per `binw`.
+
+    :param raw: Fluorescence array of shape (cycles, wells).
+    :param time: Time of each cycle in hours, shape (cycles,).
+    :param param_sets: A list of dicts with every key of `SWEEP_PARAMS`.
+    :return: A list of dicts of arrays, one per parameter set, as returned by `calculate_metrics()`.
+    """
+    raw = np.asarray(raw)
+    if raw.dtype.kind != 'f':
+        raw = raw.astype(float)
+    time = np.asarray(time, dtype=float)
+    n_cycle, n_well = raw.shape
+
+    thresholds = np.empty((len(param_sets), n_well))
+    for i, p in enumerate(param_sets):
+        if p['threshold_method'] not in THRESHOLD_METHODS:
+            raise ValueError("Invalid threshold_method. Use 'stdv', 'bg_ratio', or 'rfu_val'.")
+        if p['cycle_background'] > n_cycle:
+            raise ValueError("cycle_background exceeds number of rows in raw data")
+        if p['binw'] < 1 or p['binw'] >= n_cycle:
+            raise ValueError("binw must be at least 1 and smaller than the number of cycles")
+        background = raw[p['cycle_background'] - 1].astype(float)
+        thresholds[i] = calculate_threshold(background, p['threshold_method'], p['sd_fold'], p['bg_fold'], p['rfu'])
+
+    # Crossing cycle of every (parameter set, well), grouped by the cycles skipped
+    first = np.empty((len(param_sets), n_well), dtype=np.intp)
+    skips = np.array([max(int(p['time_skip']), 1) for p in param_sets])
+    for skip in np.unique(skips):
+        sets = np.flatnonzero(skips == skip)
+        # NaN readings never cross, as with `raw > threshold`
+        running = np.fmax.accumulate(np.nan_to_num(raw[skip:].astype(float), nan=-np.inf), axis=0)
+        for well in range(n_well):
+            first[sets, well] = np.searchsorted(running[:, well], thresholds[sets, well], side='right') + skip
+
+    crossed = first < n_cycle
+    # As in calculate_raf(), time_skip = 0 reports the cycle before the crossing
+    reported = first - (skips - np.array([int(p['time_skip']) for p in param_sets]))[:, None]
+    time_to_threshold = np.where(crossed, time[np.clip(reported, 0, n_cycle - 1)], np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        raf = 1 / time_to_threshold
+    raf[~np.isfinite(raf)] = 0
+
+    peak = raw.max(axis=0)
+    ms = {binw: calculate_ms(raw, binw) for binw in {p['binw'] for p in param_sets}}
+
+    return [{
+        'time_to_threshold': time_to_threshold[i],
+        'RAF': raf[i],
+        'MPR': peak / raw[p['cycle_background'] - 1].astype(float),
+        'MS': ms[p['binw']],
+    } for i, p in enumerate(param_sets)]
+
+
+def SweepCalculation(raw, meta, grid, norm=False, norm_ct=None):
+    """
+    Perform Calculations for a Grid of Parameters.
+
+    Runs `GetCalculation()` for every parameter set of `grid` on one plate, sharing the work
+    between sets (see `sweep_metrics()`), which is much faster than one call per set.
+
+    :param raw: Cleaned raw data. Output from `CleanRaw()`, or a `CleanedPlate`.
+    :param meta: Cleaned meta data. Output from `CleanMeta()`.
+    :param grid: A dict mapping parameters of `GetCalculation()` ('threshold_method', 'time_skip', 'sd_fold',
+                 'bg_fold', 'rfu', 'cycle_background', 'binw') to lists of values, swept over every combination,
+                 or a list of dicts of parameters. Parameters not given keep the `GetCalculation()` defaults.
+    :param norm: Boolean. If True, normalization will be performed. Default is False.
+    :param norm_ct: Sample name used to normalize calculation.
+    :return: A tidy DataFrame with one row per parameter set and well: 'param_set', the swept parameters,
+             then the columns of `GetCalculation()`.
+    """
+    if norm and norm_ct is None:
+        raise ValueError("norm_ct must be provided when norm is True")
+
+    param_sets = _param_sets(grid)
+    if isinstance(raw, CleanedPlate):
+        values, time = raw.values, raw.time
+    else:
+        values = raw.to_numpy(dtype=float)
+        time = pd.to_numeric(pd.Series(raw.index), errors="coerce").to_numpy(dtype=float)
+
+    swept = list(grid) if isinstance(grid, dict) else sorted({key for p in grid for key in p},
+                                                              key=SWEEP_PARAMS.index)
+    metrics = sweep_metrics(values, time, param_sets)
+    n_set, n_well = len(param_sets), len(meta)
+
+    # One (sets, wells) array per metric, so the table is built once rather than once per set
+    stacked = {name: np.stack([m[name] for m in metrics]) for name in metrics[0]}
+    if norm:
+        sel = (meta['content'] == norm_ct).to_numpy()
+        for name, array in stacked.items():
+            # The mean goes through pandas so it sums in the same order as `GetCalculation()`
+            mean = pd.DataFrame(array[:, sel].T).mean(skipna=False).to_numpy()
+            with np.errstate(divide="ignore", invalid="ignore"):
+                stacked[name] = array / mean[:, None]
+
+    table = pd.DataFrame({'param_set': np.repeat(np.arange(n_set), n_well)})
+    for key in swept:
+        table[key] = np.repeat([p[key] for p in param_sets], n_well)
+    calculation = meta.iloc[np.tile(np.arange(n_well), n_set)].reset_index(drop=True)
+    for name, array in stacked.items():
+        calculation[name] = array.reshape(-1)
+    calculation['XTH'] = (calculation['time_to_threshold'] > 0).astype(int)
+
+    return pd.concat([table, calculation], axis=1)
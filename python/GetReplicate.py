@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+from PlateLayout import cached_layout, layout_fingerprint, lookup_layout, store_layout
+
+def _as_label(x):
+    # Sample identifiers are compared as text, as in R's as.character()
+    return str(int(x)) if isinstance(x, float) and x.is_integer() else str(x)
+
+
+def _replicate_numbers(values, group_offset=None):
+    # values: 1-D object array in column-major plate order. Samples are factorized once, then the
+    # replicate number is the running count within each sample (a grouped cumcount).
+    replicate = np.full(len(values), np.nan)
+    present = ~pd.isna(values)
+    codes, uniques = pd.factorize(values[present])
+    # 1, 1.0 and '1' are the same sample once written as text
+    label_codes, labels = pd.factorize(np.array([_as_label(u) for u in uniques], dtype=object))
+    codes = label_codes[codes] if len(codes) else codes
+    if group_offset is not None:
+        # Batch mode: keep each plate's counts apart
+        codes = group_offset[present] * max(len(labels), 1) + codes
+    replicate[present] = pd.Series(codes).groupby(codes).cumcount().to_numpy() + 1
+    return replicate
+
+
+def GetReplicate(plate):
+    """
+    Generate Replicate Numbers for Plate Data.
+
+    This function takes a plate layout and generates a corresponding matrix of
+    replicate numbers for each sample. Wells are numbered column by column, so
+    replicate samples are expected to be encountered sequentially. Any layout
+    size works (96, 384 or 1536 wells). Each distinct layout is numbered once.
+
+    :param plate: A DataFrame representing the plate layout, where each cell contains
+                  a sample identifier or NA for empty wells.
+    :return: A DataFrame with the same dimensions and column names as the input plate,
+             where each cell contains the replicate number of the corresponding sample.
+    """
+    return cached_layout('GetReplicate', layout_fingerprint(plate), lambda: _build_replicate(plate)).copy()
+
+
+def _build_replicate(plate):
+    values = plate.to_numpy(dtype=object)
+    replicate = _replicate_numbers(values.ravel(order='F'))
+    return pd.DataFrame(replicate.reshape(values.shape, order='F'), columns=plate.columns)
+
+
+def GetReplicateBatch(plates):
+    """
+    Generate Replicate Numbers for Many Plates in One Pass.
+
+    Equivalent to calling `GetReplicate()` on every plate; the distinct layouts are
+    stacked and numbered together, with counts kept separate per layout.
+
+    :param plates: A dict or list of plate layout DataFrames.
+    :return: Replicate DataFrames in the same container type and order as `plates`.
+    """
+    items = list(plates.items()) if isinstance(plates, dict) else list(enumerate(plates))
+    if not items:
+        return {} if isinstance(plates, dict) else []
+
+    # Only layouts not seen before are numbered, each once
+    fingerprints = [layout_fingerprint(plate) for _, plate in items]
+    found = {fingerprint: lookup_layout('GetReplicate', fingerprint) for fingerprint in fingerprints}
+    todo = {fingerprint: plate for (_, plate), fingerprint in zip(items, fingerprints) if found[fingerprint] is None}
+
+    if todo:
+        arrays = [plate.to_numpy(dtype=object) for plate in todo.values()]
+        flat = np.concatenate([values.ravel(order='F') for values in arrays])
+        plate_id = np.repeat(np.arange(len(arrays)), [values.size for values in arrays])
+        replicate = _replicate_numbers(flat, group_offset=plate_id)
+
+        start = 0
+        for (fingerprint, plate), values in zip(todo.items(), arrays):
+            block = replicate[start:start + values.size].reshape(values.shape, order='F')
+            found[fingerprint] = store_layout('GetReplicate', fingerprint, pd.DataFrame(block, columns=plate.columns))
+            start += values.size
+
+    out = [found[fingerprint].copy() for fingerprint in fingerprints]
+    if isinstance(plates, dict):
+        return {name: replicate for (name, _), replicate in zip(items, out)}
+    return out
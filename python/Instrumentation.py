@@ -0,0 +1,189 @@
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MEMORY_MODES = ("rss", "tracemalloc", None)
+
+
+def _max_rss():
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def _shape(result):
+    shape = getattr(result, 'shape', None)
+    if shape is not None and len(shape) == 2:
+        return int(shape[0]), int(shape[1])
+    if isinstance(result, dict):
+        # GetAnalysis returns one frame per metric, SpreadCalculation one per term
+        return len(result), None
+    return None, None
+
+
+class Instrumentation:
+    """
+    Records wall time, CPU time, peak memory and output size of every stage of every plate.
+
+    Pass one to `BulkProcessing()` (or `IterBulkProcessing()`); each stage is bracketed by
+    `start()` and `stop()`, and one record is kept per stage and per plate. Records made in worker
+    processes are sent back and merged. Without an Instrumentation the pipeline skips all of this.
+
+    Records are dicts with 'plate', 'stage', 'start' (epoch seconds), 'wall' and 'cpu' (seconds of the
+    running process), 'peak_memory' (bytes), 'rows', 'columns', 'ok' and 'pid'. For 'CleanRaw' the rows
+    are cycles and the columns wells; for 'GetCalculation' the rows are wells.
+
+    :param memory: 'rss' (default) records the peak resident size of the process, which is nearly free;
+                   'tracemalloc' records the peak of Python allocations during each stage, at a
+                   noticeable cost; None records nothing.
+    :param callbacks: Functions called with each record as it is made, e.g. to stream them elsewhere.
+                      In worker processes they run in the worker.
+
+    With 'tracemalloc', call `close()` (or use it as a context manager) when done to stop tracing.
+    """
+
+    def __init__(self, memory="rss", callbacks=()):
+        if memory not in MEMORY_MODES:
+            raise ValueError("Invalid memory. Must be one of: 'rss', 'tracemalloc', None")
+        self.memory = memory
+        self.callbacks = list(callbacks)
+        self.records = []
+        self._open = []
+        self._started_tracing = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Stop tracemalloc if this object started it, as tracing slows everything down."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def __getstate__(self):
+        # Workers start with no records and send theirs back
+        state = self.__dict__.copy()
+        state['records'] = []
+        state['_open'] = []
+        state['_started_tracing'] = False
+        return state
+
+    def start(self, plate, stage):
+        """Begin timing `stage` of `plate`; returns the token to pass to `stop()`."""
+        if self.memory == "tracemalloc":
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            # Resetting hides the peak from enclosing stages, so it is carried over to them in stop()
+            self._carry_peak()
+            tracemalloc.reset_peak()
+        token = [plate, stage, time.time(), time.perf_counter(), time.process_time(), 0]
+        self._open.append(token)
+        return token
+
+    def _carry_peak(self):
+        peak = tracemalloc.get_traced_memory()[1]
+        for token in self._open:
+            token[5] = max(token[5], peak)
+
+    def discard(self, token):
+        """Drop a token from `start()` without keeping a record, for a stage that turned out not to run."""
+        if token in self._open:
+            self._open.remove(token)
+
+    def stop(self, token, result=None, ok=True, plate=None):
+        """
+        Finish timing and keep the record.
+
+        :param result: The stage output, used for the row and column counts.
+        :param plate: Overrides the plate given to `start()`, for stages that only learn it at the end.
+        """
+        wall_end, cpu_end = time.perf_counter(), time.process_time()
+        started_plate, stage, start, wall_start, cpu_start, _ = token
+        if plate is None:
+            plate = started_plate
+
+        if self.memory == "tracemalloc":
+            self._carry_peak()
+            peak = token[5]
+        elif self.memory == "rss":
+            peak = _max_rss()
+        else:
+            peak = None
+        if token in self._open:
+            self._open.remove(token)
+        rows, columns = _shape(result)
+
+        record = {
+            'plate': plate,
+            'stage': stage,
+            'start': start,
+            'wall': wall_end - wall_start,
+            'cpu': cpu_end - cpu_start,
+            'peak_memory': peak,
+            'rows': rows,
+            'columns': columns,
+            'ok': ok,
+            'pid': os.getpid(),
+        }
+        self.records.append(record)
+        for callback in self.callbacks:
+            callback(record)
+        return record
+
+    def wrap(self, plate, run):
+        """Wrap a stage runner `run(stage, parents, func, inputs, params)` so every stage is timed."""
+        def timed_run(stage, parents, func, inputs, params):
+            token = self.start(plate, stage)
+            try:
+                value, key = run(stage, parents, func, inputs, params)
+            except BaseException:
+                self.stop(token, ok=False)
+                raise
+            self.stop(token, value, ok=value is not None)
+            return value, key
+        return timed_run
+
+    def to_frame(self):
+        """All records as a DataFrame."""
+        return pd.DataFrame(self.records, columns=['plate', 'stage', 'start', 'wall', 'cpu', 'peak_memory',
+                                                   'rows', 'columns', 'ok', 'pid'])
+
+    def to_jsonl(self, path, append=True):
+        """Write the records to `path` as JSON lines. Appends to an existing file by default."""
+        with open(path, 'a' if append else 'w') as f:
+            for record in self.records:
+                f.write(json.dumps(record, default=str) + '\n')
+        return path
+
+    def summary(self):
+        """
+        Per-stage totals: one row per stage with 'n', 'n_failed', 'wall', 'wall_mean', 'wall_max',
+        'cpu', 'peak_memory' (the largest seen) and 'rows', in the order stages first ran.
+        """
+        frame = self.to_frame()
+        summary = frame.groupby('stage', sort=False).agg(
+            n=('wall', 'size'),
+            n_failed=('ok', lambda ok: int((~ok.astype(bool)).sum())),
+            wall=('wall', 'sum'),
+            wall_mean=('wall', 'mean'),
+            wall_max=('wall', 'max'),
+            cpu=('cpu', 'sum'),
+            peak_memory=('peak_memory', 'max'),
+            rows=('rows', 'sum'),
+        )
+        return summary.reset_index()
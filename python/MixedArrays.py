@@ -0,0 +1,56 @@
+import os
+
+import numpy as np
+
+_MISSING, _STR, _INT, _FLOAT, _BOOL = 0, 1, 2, 3, 4
+
+
+def save_mixed(directory, name, values):
+    """
+    Save an object array mixing strings, numbers and missing values as `.npy` files.
+
+    The cells are stored as a unicode array, `<name>.npy`, plus an array of type codes,
+    `<name>_kind.npy`, so no pickling is needed and `load_mixed()` restores each cell's type.
+
+    :param directory: Directory to write to.
+    :param name: Base name of the two files.
+    :param values: An array-like of str, int, float, bool, None or NaN cells.
+    """
+    values = np.asarray(values, dtype=object)
+    kind = np.full(values.shape, _STR, dtype=np.int8)
+    text = np.empty(values.shape, dtype=object)
+    for index, value in np.ndenumerate(values):
+        if isinstance(value, (bool, np.bool_)):
+            kind[index] = _BOOL
+        elif isinstance(value, (int, np.integer)):
+            kind[index] = _INT
+        elif isinstance(value, (float, np.floating)):
+            kind[index] = _MISSING if np.isnan(value) else _FLOAT
+        elif value is None:
+            kind[index] = _MISSING
+        text[index] = '' if kind[index] == _MISSING else str(value)
+    np.save(os.path.join(directory, name + '.npy'), text.astype(str))
+    np.save(os.path.join(directory, name + '_kind.npy'), kind)
+
+
+def load_mixed(directory, name):
+    """
+    Load an array written by `save_mixed()`.
+
+    :param directory: Directory holding the files.
+    :param name: Base name given to `save_mixed()`.
+    :return: An object array; missing cells are NaN.
+    """
+    text = np.load(os.path.join(directory, name + '.npy'))
+    kind = np.load(os.path.join(directory, name + '_kind.npy'))
+    values = np.full(text.shape, np.nan, dtype=object)
+    for index, k in np.ndenumerate(kind):
+        if k == _STR:
+            values[index] = str(text[index])
+        elif k == _INT:
+            values[index] = int(text[index])
+        elif k == _FLOAT:
+            values[index] = float(text[index])
+        elif k == _BOOL:
+            values[index] = text[index] == 'True'
+    return values
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from MixedArrays import load_mixed, save_mixed
+from ReadMARS import MARSRaw, ReadMARS, ReadPlate
+
+# Bump when the on-disk layout changes so stale entries are ignored instead of misread
+CACHE_VERSION = 1
+
+
+def _file_state(path):
+    st = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def _file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _func_name(func):
+    # Identifies the function that built a cached replicate map, so another one never reuses it
+    if func is None:
+        return None
+    return f"{getattr(func, '__module__', None)}.{getattr(func, '__qualname__', repr(func))}"
+
+
+def _entry_matches(loaded, replicate_func):
+    # An entry is reused only if it holds the replicate map of the same function, when one is asked for
+    if loaded is None:
+        return False
+    if replicate_func is None:
+        return True
+    return loaded['replicate'] is not None and loaded['replicate_func'] == _func_name(replicate_func)
+
+
+def _save_entry(entry_dir, plate, raw, replicate, sources, replicate_func=None):
+    # Written to a sibling temp dir and renamed, so a crashed or concurrent writer never leaves half an entry
+    parent = os.path.dirname(entry_dir)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix='.tmp-')
+    try:
+        np.save(os.path.join(tmp_dir, 'values.npy'), np.ascontiguousarray(raw.values, dtype=float))
+        np.save(os.path.join(tmp_dir, 'time.npy'), np.asarray(raw.time, dtype=float))
+        np.save(os.path.join(tmp_dir, 'well.npy'), np.asarray(raw.well, dtype=str))
+        save_mixed(tmp_dir, 'content', raw.content)
+        save_mixed(tmp_dir, 'time_label', raw.time_label)
+        save_mixed(tmp_dir, 'plate', plate.to_numpy(dtype=object))
+        save_mixed(tmp_dir, 'plate_columns', np.array(list(plate.columns), dtype=object))
+        if replicate is not None:
+            np.save(os.path.join(tmp_dir, 'replicate.npy'), replicate.to_numpy(dtype=float))
+            save_mixed(tmp_dir, 'replicate_columns', np.array(list(replicate.columns), dtype=object))
+
+        manifest = {
+            'version': CACHE_VERSION,
+            'sources': sources,
+            'read_label': raw.read_label,
+            'time_header': raw.time_header,
+            'has_replicate': replicate is not None,
+            'replicate_func': _func_name(replicate_func),
+        }
+        with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f)
+
+        try:
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            # Another process stored the same content first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def _load_entry(entry_dir, mmap_mode='r'):
+    with open(os.path.join(entry_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != CACHE_VERSION:
+        return None
+
+    raw = MARSRaw(
+        time=np.load(os.path.join(entry_dir, 'time.npy'), mmap_mode=mmap_mode),
+        values=np.load(os.path.join(entry_dir, 'values.npy'), mmap_mode=mmap_mode),
+        well=np.load(os.path.join(entry_dir, 'well.npy')),
+        content=load_mixed(entry_dir, 'content'),
+        time_label=load_mixed(entry_dir, 'time_label'),
+        read_label=manifest['read_label'],
+        time_header=manifest['time_header'],
+    )
+    plate = pd.DataFrame(
+        load_mixed(entry_dir, 'plate'),
+        columns=list(load_mixed(entry_dir, 'plate_columns'))
+    ).infer_objects()
+
+    replicate = None
+    if manifest['has_replicate']:
+        replicate = pd.DataFrame(
+            np.load(os.path.join(entry_dir, 'replicate.npy'), mmap_mode=mmap_mode),
+            columns=list(load_mixed(entry_dir, 'replicate_columns'))
+        )
+
+    return {'plate': plate, 'raw': raw, 'replicate': replicate, 'replicate_func': manifest.get('replicate_func')}
+
+
+def _index_path(cache_dir, plate_path, raw_path):
+    # One small index file per (plate, raw) pair so parallel readers never rewrite a shared file
+    name = hashlib.sha1(f"{os.path.abspath(plate_path)}\0{os.path.abspath(raw_path)}".encode()).hexdigest()
+    return os.path.join(cache_dir, 'index', name + '.json')
+
+
+def LoadPlateFolder(plate_path, raw_path, cache_dir, replicate_func=None, mmap_mode='r'):
+    """
+    Load a plate layout and MARS raw export through an on-disk cache.
+
+    Entries are keyed by the SHA-256 of both source files and stored as `.npy` arrays, so the
+    raw matrix and time vector are memory-mapped on later loads. The file size and mtime are
+    checked first; the files are only re-hashed when those change, and only re-parsed when
+    the content changed too.
+
+    :param plate_path: Path to the `*_plate.xlsx` file.
+    :param raw_path: Path to the `*_raw.xlsx` export.
+    :param cache_dir: Directory holding the cache. Created if needed.
+    :param replicate_func: Optional function building the replicate map from the plate layout
+                           (e.g. `GetReplicate`). Its output is cached with the plate, along with
+                           the function's qualified name; an entry built by another function is rebuilt.
+    :param mmap_mode: Passed to `np.load()` for the numeric arrays. Use None to load into memory.
+    :return: A dict with 'plate' (DataFrame), 'raw' (`MARSRaw`) and 'replicate' (DataFrame or None).
+    """
+    index_path = _index_path(cache_dir, plate_path, raw_path)
+    states = [_file_state(plate_path), _file_state(raw_path)]
+
+    index = None
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+
+    # Fast path: neither file was touched since it was last hashed
+    if index is not None and index['states'] == states:
+        hashes = index['hashes']
+    else:
+        hashes = [_file_hash(plate_path), _file_hash(raw_path)]
+
+    key = hashlib.sha256(f"v{CACHE_VERSION}:{hashes[0]}:{hashes[1]}".encode()).hexdigest()
+    entry_dir = os.path.join(cache_dir, 'entries', key)
+
+    loaded = None
+    if os.path.exists(os.path.join(entry_dir, 'manifest.json')):
+        loaded = _load_entry(entry_dir, mmap_mode=mmap_mode)
+        if not _entry_matches(loaded, replicate_func):
+            loaded = None
+
+    if loaded is None:
+        plate = ReadPlate(plate_path)
+        raw = ReadMARS(raw_path)
+        replicate = replicate_func(plate) if replicate_func is not None else None
+        if os.path.exists(entry_dir):
+            shutil.rmtree(entry_dir, ignore_errors=True)
+        _save_entry(entry_dir, plate, raw, replicate, states, replicate_func)
+        loaded = _load_entry(entry_dir, mmap_mode=mmap_mode)
+        if not _entry_matches(loaded, replicate_func):
+            # Another writer stored the entry first, with another replicate_func; use what was just built
+            loaded = {'plate': plate, 'raw': raw, 'replicate': replicate}
+
+    loaded.pop('replicate_func', None)
+
+    if index is None or index['states'] != states or index['hashes'] != hashes:
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'states': states, 'hashes': hashes}, f)
+        os.replace(tmp_path, index_path)
+
+    return loaded
+
+
+def ClearPlateCache(cache_dir):
+    """
+    Remove every cached plate under `cache_dir`.
+
+    :param cache_dir: Directory passed to `LoadPlateFolder()`.
+    """
+    for sub in ('entries', 'index'):
+        shutil.rmtree(os.path.join(cache_dir, sub), ignore_errors=True)
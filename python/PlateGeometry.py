@@ -0,0 +1,85 @@
+import string
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+class PlateGeometry(NamedTuple):
+    """
+    Well layout of one plate format. Wells are numbered row by row ('A01', 'A02', ...),
+    the order MARS exports them and `CleanMeta()` lists them in.
+    """
+    format: int
+    n_row: int
+    n_col: int
+    rows: tuple
+    cols: tuple
+    well: np.ndarray        # well names, shape (format,)
+    row_index: np.ndarray   # 0-based row of each well
+    col_index: np.ndarray   # 0-based column of each well
+    well_index: pd.Index    # well name -> position, via get_indexer()
+
+
+def _build(n_row, n_col):
+    # 1536-well plates continue after 'Z' with 'AA' to 'AF'
+    row_labels = list(string.ascii_uppercase) + ['A' + letter for letter in string.ascii_uppercase]
+    rows = tuple(row_labels[:n_row])
+    cols = tuple(f"{i:02}" for i in range(1, n_col + 1))
+    well = np.array([r + c for r in rows for c in cols])
+    row_index, col_index = np.divmod(np.arange(n_row * n_col), n_col)
+    for array in (well, row_index, col_index):
+        # Shared by every caller, so keep them read-only
+        array.flags.writeable = False
+    return PlateGeometry(n_row * n_col, n_row, n_col, rows, cols, well, row_index, col_index, pd.Index(well))
+
+
+PLATE_GEOMETRY = {
+    96: _build(8, 12),
+    384: _build(16, 24),
+    1536: _build(32, 48),
+}
+
+# Layouts have one column of row labels followed by one column per plate column
+_FORMAT_BY_COLUMNS = {geometry.n_col + 1: plate_format for plate_format, geometry in PLATE_GEOMETRY.items()}
+
+
+def GetPlateGeometry(plate_format):
+    """
+    Look up the geometry of a plate format.
+
+    :param plate_format: 96, 384 or 1536.
+    :return: A `PlateGeometry`.
+    """
+    try:
+        return PLATE_GEOMETRY[int(plate_format)]
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Invalid format. Must be either 96, 384 or 1536.") from None
+
+
+def plate_format_of(plate):
+    """
+    Plate format of a layout read from a `*_plate.xlsx` file, from its number of columns.
+    Layouts that match no format are treated as 384-well, as in the R version.
+    """
+    return _FORMAT_BY_COLUMNS.get(plate.shape[1], 384)
+
+
+def well_positions(wells, raw_wells, geometry):
+    """
+    Column of each of `wells` in a raw export whose columns are `raw_wells`.
+
+    Both lists are mapped to integer well numbers through the precomputed `geometry.well_index`;
+    when the export holds the full plate in the usual order, the well numbers are the positions.
+
+    :return: An integer array, -1 for wells missing from the export.
+    """
+    ids = geometry.well_index.get_indexer(wells)
+    raw_ids = geometry.well_index.get_indexer(raw_wells)
+    if len(raw_ids) == geometry.format and (raw_ids == np.arange(geometry.format)).all():
+        return ids
+
+    lookup = np.full(geometry.format, -1)
+    known = raw_ids >= 0
+    lookup[raw_ids[known]] = np.flatnonzero(known)
+    return np.where(ids >= 0, lookup[ids], -1)
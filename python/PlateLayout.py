@@ -0,0 +1,98 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Number of per-layout results kept; a run rarely has more than a few distinct layouts
+LAYOUT_CACHE_SIZE = 256
+
+_layout_cache = OrderedDict()
+_layout_lock = threading.Lock()
+
+
+def _update_hash(digest, value):
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr(list(value.columns)).encode())
+        value = value.to_numpy(dtype=object).ravel()
+    elif not isinstance(value, (pd.Series, pd.Index, np.ndarray)):
+        digest.update(repr(value).encode())
+        return
+
+    values = value if isinstance(value, np.ndarray) else value.to_numpy()
+    digest.update(f"{values.dtype}{values.shape}".encode())
+    if values.dtype.kind in 'biuf':
+        digest.update(np.ascontiguousarray(values).tobytes())
+    else:
+        # By repr, so 1 and '1' differ, where pandas' hashes compare cells as text
+        digest.update(repr(values.tolist()).encode())
+
+
+def layout_fingerprint(*grids):
+    """
+    Hash of a plate layout, such as the content grid of a `*_plate.xlsx` file and its replicates.
+
+    Cells are hashed with their type, so 1, 1.0 and '1' give different fingerprints, as they give
+    different `content` values in `CleanMeta()`.
+
+    :param grids: DataFrames, arrays or plain values describing the layout.
+    :return: A hex string.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for grid in grids:
+        _update_hash(digest, grid)
+    return digest.hexdigest()
+
+
+def _key(stage, fingerprint, params):
+    return stage, fingerprint, repr(sorted(params.items())) if params else ''
+
+
+def cached_layout(stage, fingerprint, build, params=None):
+    """
+    Return the result of `build()` for a layout, computing it once per distinct layout and params.
+
+    Results are shared between callers, so they must not be modified in place; return a copy.
+
+    :param stage: Name of what is cached, e.g. 'CleanMeta'.
+    :param fingerprint: Output of `layout_fingerprint()`.
+    :param build: Function with no arguments computing the result.
+    :param params: A dict of the arguments the result depends on besides the layout.
+    """
+    key = _key(stage, fingerprint, params)
+    with _layout_lock:
+        if key in _layout_cache:
+            _layout_cache.move_to_end(key)
+            return _layout_cache[key]
+    value = build()
+    store_layout(stage, fingerprint, value, params)
+    return value
+
+
+def lookup_layout(stage, fingerprint, params=None):
+    """The cached result for a layout, or None."""
+    with _layout_lock:
+        return _layout_cache.get(_key(stage, fingerprint, params))
+
+
+def store_layout(stage, fingerprint, value, params=None):
+    """Cache `value` for a layout."""
+    with _layout_lock:
+        key = _key(stage, fingerprint, params)
+        _layout_cache[key] = value
+        _layout_cache.move_to_end(key)
+        while len(_layout_cache) > LAYOUT_CACHE_SIZE:
+            _layout_cache.popitem(last=False)
+    return value
+
+
+def ClearLayoutCache():
+    """
+    Clear the Cache of Per-Layout Results.
+
+    `CleanMeta()`, `GetReplicate()` and `CleanRaw()` compute their layout-dependent parts once per
+    distinct plate layout in each process; this frees them.
+    """
+    with _layout_lock:
+        _layout_cache.clear()
@@ -0,0 +1,162 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from PlateGeometry import PLATE_GEOMETRY, GetPlateGeometry
+from ReadMARS import MARSRaw
+
+
+def minmax_decimate(values, n_bins):
+    """
+    Reduce every trace to the minimum and maximum of each of `n_bins` bins of cycles.
+
+    Drawn at a resolution of `n_bins` pixels, the result looks the same as the full trace:
+    every spike and dip is kept, unlike with plain subsampling.
+
+    :param values: Array of shape (cycles, traces).
+    :param n_bins: Number of bins, usually the width of a trace in pixels.
+    :return: An integer array of shape (points, traces) of the cycles to keep, in increasing order.
+             All cycles when there are no more than `2 * n_bins` of them.
+    """
+    n_cycle, n_trace = values.shape
+    if n_bins < 1 or n_cycle <= 2 * n_bins:
+        return np.broadcast_to(np.arange(n_cycle)[:, None], (n_cycle, n_trace))
+
+    size = -(-n_cycle // n_bins)
+    n_bins = -(-n_cycle // size)
+    padded = np.full((n_bins * size, n_trace), np.nan)
+    padded[:n_cycle] = values
+    padded = padded.reshape(n_bins, size, n_trace)
+
+    # NaN readings are never picked unless the whole bin is NaN
+    start = (np.arange(n_bins) * size)[:, None]
+    low = start + np.nan_to_num(padded, nan=np.inf).argmin(axis=1)
+    high = start + np.nan_to_num(padded, nan=-np.inf).argmax(axis=1)
+    index = np.sort(np.stack([low, high]), axis=0)
+    return np.minimum(index.transpose(1, 0, 2).reshape(2 * n_bins, n_trace), n_cycle - 1)
+
+
+def _plate_matrix(raw, plate_time):
+    # (time, values, wells) from a MARSRaw or the `pd.read_excel()` layout, converted once
+    if isinstance(raw, MARSRaw):
+        return np.asarray(raw.time, dtype=float), np.asarray(raw.values, dtype=float), np.asarray(raw.well)
+    if plate_time is None:
+        raise ValueError("plate_time is required when raw is a data frame")
+    values = raw.iloc[1:, 2:].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    time = pd.to_numeric(plate_time.iloc[:, 0], errors='coerce').to_numpy(dtype=float)
+    return time, values, np.asarray(raw.columns[2:])
+
+
+def PlotPlate(raw, plate_time=None, plate_format=None, f_size=5, fill=False, width=None, dpi=100, labels=True):
+    """
+    Plot Time Series Data for Each Well in a Plate Layout.
+
+    Draws every well of the plate in its place on the plate grid. All traces go into one
+    `LineCollection` with per-well offsets, and each trace is reduced to the resolution of its
+    cell with `minmax_decimate()`, so a 384-well plate renders in a fraction of a second.
+    Requires matplotlib; pyplot is not used, so figures can be rendered from worker processes.
+
+    :param raw: The output of `ReadMARS()`, or a DataFrame of the raw export with the first row and first
+                two columns holding metadata.
+    :param plate_time: Output from `ConvertTime()`. Only needed when raw is a data frame.
+    :param plate_format: Format of plates used in the experiment. 96, 384 or 1536. By default the
+                         smallest format holding every well of raw.
+    :param f_size: Font size for the well labels. Default is 5.
+    :param fill: Boolean, whether to draw missing wells as 0. Default is False (leave them empty).
+    :param width: Figure width in inches. Default is 0.6 inch per plate column.
+    :param dpi: Resolution of the figure, used to pick the number of points per trace. Default is 100.
+    :param labels: Boolean, whether to label each cell with its well. Default is True.
+    :return: A matplotlib `Figure`.
+    """
+    from matplotlib.collections import LineCollection
+    from matplotlib.figure import Figure
+
+    time, values, wells = _plate_matrix(raw, plate_time)
+
+    if plate_format is None:
+        plate_format = next((fmt for fmt, geometry in sorted(PLATE_GEOMETRY.items())
+                             if (geometry.well_index.get_indexer(wells) >= 0).all()), 1536)
+    geometry = GetPlateGeometry(plate_format)
+
+    position = geometry.well_index.get_indexer(wells)
+    keep = position >= 0
+    position, values = position[keep], values[:, keep]
+    if fill:
+        missing = np.setdiff1d(np.arange(geometry.format), position)
+        position = np.concatenate([position, missing])
+        values = np.concatenate([values, np.zeros((len(time), len(missing)))], axis=1)
+
+    if width is None:
+        width = 0.6 * geometry.n_col
+    height = width * geometry.n_row / geometry.n_col
+    fig = Figure(figsize=(width, height), dpi=dpi)
+    ax = fig.add_axes((0, 0, 1, 1))
+
+    # Every trace shares one y scale, as ylim(0, global_max) does in the R version
+    global_max = np.nanmax(values) / 0.8 if values.size and np.isfinite(values).any() else 1.0
+    span = np.nanmax(time) - np.nanmin(time) if len(time) else 0.0
+    x = (time - np.nanmin(time)) / span if span > 0 else np.zeros_like(time)
+
+    cell_pixels = int(width * dpi / geometry.n_col)
+    index = minmax_decimate(values, cell_pixels)
+    x = x[index]
+    y = np.clip(np.take_along_axis(values, index, axis=0) / global_max, 0, 1)
+
+    # Each trace is drawn into its cell, leaving a margin around it
+    col = geometry.col_index[position]
+    row = geometry.n_row - 1 - geometry.row_index[position]
+    segments = np.stack([col + 0.05 + 0.9 * x, row + 0.05 + 0.8 * y], axis=-1).transpose(1, 0, 2)
+    ax.add_collection(LineCollection(segments, colors='black', linewidths=0.5))
+
+    ax.vlines(np.arange(geometry.n_col + 1), 0, geometry.n_row, colors='gray', linewidths=0.5)
+    ax.hlines(np.arange(geometry.n_row + 1), 0, geometry.n_col, colors='gray', linewidths=0.5)
+    if labels:
+        for r, c, well in zip(geometry.n_row - 1 - geometry.row_index, geometry.col_index, geometry.well):
+            ax.text(c + 0.5, r + 0.97, well, fontsize=f_size, fontweight='bold', ha='center', va='top')
+
+    ax.set_xlim(0, geometry.n_col)
+    ax.set_ylim(0, geometry.n_row)
+    ax.set_axis_off()
+    return fig
+
+
+def _render(name, experiment, out_dir, kwargs):
+    path = os.path.join(out_dir, f"{name}.png")
+    fig = PlotPlate(experiment['raw'], **kwargs)
+    fig.savefig(path)
+    return path
+
+
+def PlotPlateBatch(data, out_dir, n_workers=1, **kwargs):
+    """
+    Render the plate overview of many plates to PNG files.
+
+    :param data: Output of `BulkReadMARS()`, or an iterable of `(name, plate)` pairs such as `IterReadMARS()`.
+                 Each plate is a dict whose 'raw' is the output of `ReadMARS()`.
+    :param out_dir: Folder for the `<name>.png` files. Created if needed.
+    :param n_workers: Number of worker processes. Default is 1.
+    :param kwargs: Passed to `PlotPlate()`.
+    :return: A dict of the written paths keyed by plate name, in the order of `data`.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    items = data.items() if isinstance(data, dict) else data
+
+    if n_workers is None or n_workers <= 1:
+        return {name: _render(name, experiment, out_dir, kwargs) for name, experiment in items}
+
+    # At most 2 * n_workers plates in flight, so a lazy source is never read far ahead
+    paths = {}
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        in_flight = deque()
+        for name, experiment in items:
+            in_flight.append((name, executor.submit(_render, name, experiment, out_dir, kwargs)))
+            if len(in_flight) >= 2 * n_workers:
+                name, future = in_flight.popleft()
+                paths[name] = future.result()
+        while in_flight:
+            name, future = in_flight.popleft()
+            paths[name] = future.result()
+    return paths
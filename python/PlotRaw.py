@@ -0,0 +1,318 @@
+import html
+import json
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from CleanRaw import CleanedPlate
+from PlotPlate import minmax_decimate
+
+DECIMATION_METHODS = ("minmax", "lttb", "none")
+
+
+class SampleIndex:
+    """
+    Sample -> column lookup over the `content_replicate` columns of a cleaned raw matrix.
+
+    The labels are sorted once, so the columns of a sample (those whose label starts with it,
+    as `grep(paste0('^', sample), colnames(raw))` in the R version, but matched literally) are
+    found with two binary searches instead of a scan of every column.
+    """
+
+    def __init__(self, columns):
+        labels = np.array([str(c) for c in columns], dtype=object)
+        self._order = np.argsort(labels, kind='stable')
+        self._sorted = labels[self._order]
+
+    def columns(self, sample):
+        """Positions of the columns of `sample`, in column order."""
+        sample = str(sample)
+        lo = np.searchsorted(self._sorted, sample, side='left')
+        hi = np.searchsorted(self._sorted, sample + '\U0010ffff', side='left')
+        return np.sort(self._order[lo:hi])
+
+
+def lttb(x, values, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling of traces sharing the same x.
+
+    Keeps the points that preserve the visual shape of each trace, always including the first
+    and last. The buckets are walked once and every trace is handled at the same time.
+
+    :param x: Array of shape (cycles,).
+    :param values: Array of shape (cycles, traces).
+    :param n_out: Number of points kept per trace.
+    :return: An integer array of shape (points, traces) of the cycles to keep, in increasing order.
+    """
+    n_cycle, n_trace = values.shape
+    if n_out >= n_cycle or n_out < 3:
+        return np.broadcast_to(np.arange(n_cycle)[:, None], (n_cycle, n_trace))
+
+    # n_out - 2 buckets between the first and last points
+    edges = np.append((np.arange(n_out - 2) * ((n_cycle - 2) / (n_out - 2))).astype(int) + 1, n_cycle - 1)
+    traces = np.arange(n_trace)
+    index = np.empty((n_out, n_trace), dtype=np.intp)
+    index[0], index[-1] = 0, n_cycle - 1
+
+    previous = np.zeros(n_trace, dtype=np.intp)
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        next_hi = edges[b + 2] if b + 2 < len(edges) else n_cycle
+        mean_x = x[hi:next_hi].mean()
+        with warnings.catch_warnings():
+            # An all-NaN bucket gives a NaN mean, and so NaN areas that are never picked
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mean_y = np.nanmean(values[hi:next_hi], axis=0)
+        px, py = x[previous], values[previous, traces]
+        area = np.abs((px - mean_x) * (values[lo:hi] - py) - (px - x[lo:hi, None]) * (mean_y - py))
+        index[b + 1] = lo + np.nan_to_num(area, nan=-1.0).argmax(axis=0)
+        previous = index[b + 1]
+    return index
+
+
+def _decimate(time, values, max_points, method):
+    if method not in DECIMATION_METHODS:
+        raise ValueError(f"Invalid method. Must be one of: {', '.join(DECIMATION_METHODS)}")
+    if method == "none" or max_points is None:
+        return np.broadcast_to(np.arange(len(time))[:, None], values.shape)
+    if method == "lttb":
+        return lttb(time, values, max_points)
+    return minmax_decimate(values, max_points // 2)
+
+
+def _plates(raw):
+    # {plate: (time, values, index)} for one cleaned raw matrix or a dict of them
+    frames = raw if isinstance(raw, dict) else {None: raw}
+    plates = {}
+    for name, frame in frames.items():
+        if isinstance(frame, CleanedPlate):
+            time, values, columns = frame.time, frame.values, frame.labels()
+        else:
+            time = pd.to_numeric(pd.Series(frame.index), errors='coerce').to_numpy(dtype=float)
+            values, columns = frame.to_numpy(dtype=float), frame.columns
+        plates[name] = (time, values, SampleIndex(columns))
+    return plates
+
+
+def RawTraces(raw, samples, max_points=1000, method="minmax"):
+    """
+    Collect the decimated traces of some samples, ready to draw.
+
+    :param raw: Output of `CleanRaw()` (a DataFrame or `CleanedPlate`), or a dict of them keyed by
+                plate name such as `BulkProcessing()['combined_cleanraw']`.
+    :param samples: Sample names; each matches the columns whose label starts with it.
+    :param max_points: Maximum number of points kept per trace. Default is 1000.
+    :param method: 'minmax' (min and max of each bin, default), 'lttb', or 'none'.
+    :return: A dict keyed by sample of lists of `(plate, column, x, y)` traces, NaN readings dropped.
+    """
+    traces = {sample: [] for sample in samples}
+    for plate, (time, values, index) in _plates(raw).items():
+        for sample in samples:
+            cols = index.columns(sample)
+            if len(cols) == 0:
+                continue
+            block = values[:, cols]
+            keep = _decimate(time, block, max_points, method)
+            xs = time[keep]
+            ys = np.take_along_axis(block, keep, axis=0)
+            for j, col in enumerate(cols):
+                valid = ~np.isnan(ys[:, j])
+                traces[sample].append((plate, col, xs[valid, j], ys[valid, j]))
+    return traces
+
+
+def _limits(traces, xlim, ylim):
+    xs = [x for sample in traces.values() for _, _, x, _ in sample if len(x)]
+    ys = [y for sample in traces.values() for _, _, _, y in sample if len(y)]
+    if xlim is None:
+        xlim = (min(x.min() for x in xs), max(x.max() for x in xs)) if xs else (0, 1)
+    if ylim is None:
+        # Only the plotted columns set the scale, not the whole matrix
+        ylim = (0, max(y.max() for y in ys) / 0.8) if ys else (0, 1)
+    return xlim, ylim
+
+
+def PlotRawMulti(raw, samples, legend_position="upper left", xlim=None, ylim=None, custom_colors=None,
+                 xlab="Time (h)", ylab="Fluorescence", linetypes=None, max_points=1000, method="minmax", ax=None):
+    """
+    Plot Raw Data of Multiple Samples.
+
+    Every replicate of each sample is drawn in the sample's color and line type. Columns are
+    looked up through a `SampleIndex` built once per plate, traces are decimated (see `RawTraces()`)
+    and each sample is drawn as a single `LineCollection`, so overlays across many plates stay fast.
+    Requires matplotlib.
+
+    :param raw: Output of `CleanRaw()`, or a dict of them keyed by plate name.
+    :param samples: A list of sample names.
+    :param legend_position: Position of the legend, as accepted by matplotlib. Default is 'upper left'.
+    :param xlim: Range of the x axis. Default is the range of time.
+    :param ylim: Range of the y axis. Default is from 0 to the maximum of the plotted traces / 0.8.
+    :param custom_colors: Colors for the samples, recycled. Default is matplotlib's color cycle.
+    :param xlab: Label of the x axis. Default is 'Time (h)'.
+    :param ylab: Label of the y axis. Default is 'Fluorescence'.
+    :param linetypes: Line styles for the samples, recycled. Default is solid.
+    :param max_points: Maximum number of points drawn per trace. Default is 1000.
+    :param method: Decimation method, 'minmax', 'lttb' or 'none'. Default is 'minmax'.
+    :param ax: Optional matplotlib Axes to draw into. Default is a new Figure.
+    :return: The matplotlib Axes.
+    """
+    from matplotlib.collections import LineCollection
+    from matplotlib.figure import Figure
+    from matplotlib.lines import Line2D
+
+    if ax is None:
+        ax = Figure().add_subplot()
+    colors = custom_colors or [f"C{i % 10}" for i in range(len(samples))]
+    styles = linetypes or ['-']
+
+    traces = RawTraces(raw, samples, max_points=max_points, method=method)
+    handles = []
+    for i, sample in enumerate(samples):
+        color, style = colors[i % len(colors)], styles[i % len(styles)]
+        ax.add_collection(LineCollection([np.column_stack([x, y]) for _, _, x, y in traces[sample]],
+                                         colors=color, linestyles=style, linewidths=1))
+        handles.append(Line2D([], [], color=color, linestyle=style, label=str(sample)))
+
+    xlim, ylim = _limits(traces, xlim, ylim)
+    ax.set_xlim(*xlim)
+    ax.set_ylim(*ylim)
+    ax.set_xlabel(xlab)
+    ax.set_ylabel(ylab)
+    ax.legend(handles=handles, loc=legend_position, fontsize='small')
+    return ax
+
+
+def PlotRawSingle(raw, sample, legend_position="upper left", xlim=None, ylim=None, custom_colors=None,
+                  xlab="Time (h)", ylab="Fluorescence", linetypes=None, max_points=1000, method="minmax", ax=None):
+    """
+    Plot Raw Data of One Sample, One Line per Replicate.
+
+    Takes the same arguments as `PlotRawMulti()`, except that colors and line types are recycled over
+    the replicates of `sample`, which the legend numbers from 1.
+
+    :return: The matplotlib Axes.
+    """
+    from matplotlib.collections import LineCollection
+    from matplotlib.figure import Figure
+    from matplotlib.lines import Line2D
+
+    if ax is None:
+        ax = Figure().add_subplot()
+    traces = RawTraces(raw, [sample], max_points=max_points, method=method)
+    n = len(traces[sample])
+    colors = custom_colors or [f"C{i % 10}" for i in range(n)]
+    styles = linetypes or ['-']
+
+    lines = LineCollection([np.column_stack([x, y]) for _, _, x, y in traces[sample]],
+                           colors=[colors[i % len(colors)] for i in range(n)],
+                           linestyles=[styles[i % len(styles)] for i in range(n)], linewidths=1)
+    ax.add_collection(lines)
+
+    xlim, ylim = _limits(traces, xlim, ylim)
+    ax.set_xlim(*xlim)
+    ax.set_ylim(*ylim)
+    ax.set_xlabel(xlab)
+    ax.set_ylabel(ylab)
+    if n:
+        ax.legend(handles=[Line2D([], [], color=colors[i % len(colors)], linestyle=styles[i % len(styles)],
+                                  label=str(i + 1)) for i in range(n)], loc=legend_position, fontsize='small')
+    return ax
+
+
+_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>body{{font-family:sans-serif;margin:1em}} canvas{{border:1px solid #ccc;cursor:crosshair}}
+label{{margin-right:1em}} #hint{{color:#666;font-size:small}}</style></head>
+<body><h3>{title}</h3><div id="legend"></div><canvas id="plot" width="{width}" height="{height}"></canvas>
+<div id="hint">Drag to zoom into a time range, double-click to reset.</div>
+<script>
+const data = {data};
+const canvas = document.getElementById('plot'), ctx = canvas.getContext('2d');
+const pad = 50, shown = data.samples.map(() => true);
+let view = data.xlim.slice(), drag = null;
+data.samples.forEach((s, i) => {{
+  const l = document.createElement('label');
+  const box = document.createElement('input'), swatch = document.createElement('span');
+  box.type = 'checkbox'; box.checked = true;
+  box.onchange = e => {{ shown[i] = e.target.checked; draw(); }};
+  swatch.style.color = s.color; swatch.textContent = '\u25AC';
+  l.append(box, ' ', swatch, ' ', document.createTextNode(s.name));
+  document.getElementById('legend').appendChild(l);
+}});
+function sx(x) {{ return pad + (x - view[0]) / (view[1] - view[0]) * (canvas.width - 2 * pad); }}
+function sy(y) {{ return canvas.height - pad - (y - data.ylim[0]) / (data.ylim[1] - data.ylim[0]) * (canvas.height - 2 * pad); }}
+function draw() {{
+  ctx.clearRect(0, 0, canvas.width, canvas.height);
+  ctx.save(); ctx.beginPath(); ctx.rect(pad, pad, canvas.width - 2 * pad, canvas.height - 2 * pad); ctx.clip();
+  data.samples.forEach((s, i) => {{
+    if (!shown[i]) return;
+    ctx.strokeStyle = s.color; ctx.lineWidth = 1;
+    s.traces.forEach(t => {{
+      ctx.beginPath();
+      t.x.forEach((x, k) => k ? ctx.lineTo(sx(x), sy(t.y[k])) : ctx.moveTo(sx(x), sy(t.y[k])));
+      ctx.stroke();
+    }});
+  }});
+  ctx.restore();
+  ctx.strokeStyle = '#000'; ctx.strokeRect(pad, pad, canvas.width - 2 * pad, canvas.height - 2 * pad);
+  ctx.fillStyle = '#000'; ctx.font = '12px sans-serif';
+  ctx.fillText(view[0].toFixed(1), pad, canvas.height - pad + 15);
+  ctx.fillText(view[1].toFixed(1), canvas.width - pad - 20, canvas.height - pad + 15);
+  ctx.fillText(data.ylim[1].toFixed(0), 2, pad + 4);
+  ctx.fillText(data.xlab, canvas.width / 2 - 20, canvas.height - 10);
+  ctx.save(); ctx.translate(12, canvas.height / 2 + 30); ctx.rotate(-Math.PI / 2); ctx.fillText(data.ylab, 0, 0); ctx.restore();
+}}
+function tx(px) {{ return view[0] + (px - pad) / (canvas.width - 2 * pad) * (view[1] - view[0]); }}
+canvas.onmousedown = e => {{ drag = e.offsetX; }};
+canvas.onmouseup = e => {{
+  if (drag !== null && Math.abs(e.offsetX - drag) > 5) {{
+    const a = tx(Math.min(drag, e.offsetX)), b = tx(Math.max(drag, e.offsetX)); view = [a, b]; draw();
+  }}
+  drag = null;
+}};
+canvas.ondblclick = () => {{ view = data.xlim.slice(); draw(); }};
+draw();
+</script></body></html>
+"""
+
+
+def ExportRawHTML(path, raw, samples, title="Raw fluorescence", custom_colors=None, xlab="Time (h)",
+                  ylab="Fluorescence", max_points=1000, method="minmax", width=900, height=500):
+    """
+    Write an interactive HTML viewer of the traces of some samples.
+
+    The page is self-contained (no external scripts); the decimated traces are embedded as JSON and
+    drawn on a canvas, with a checkbox per sample and drag-to-zoom on the time axis.
+
+    :param path: Path of the HTML file to write.
+    :param raw: Output of `CleanRaw()`, or a dict of them keyed by plate name.
+    :param samples: A list of sample names.
+    :param title: Title of the page.
+    :param custom_colors: CSS colors for the samples, recycled. Default is matplotlib's color cycle.
+    :param max_points: Maximum number of points per trace. Default is 1000.
+    :param method: Decimation method, 'minmax', 'lttb' or 'none'. Default is 'minmax'.
+    :return: `path`.
+    """
+    palette = custom_colors or ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+                                '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
+    traces = RawTraces(raw, samples, max_points=max_points, method=method)
+    xlim, ylim = _limits(traces, None, None)
+    data = {
+        'xlim': [float(v) for v in xlim],
+        'ylim': [float(v) for v in ylim],
+        'xlab': xlab,
+        'ylab': ylab,
+        'samples': [{
+            'name': str(sample),
+            'color': palette[i % len(palette)],
+            'traces': [{'plate': None if plate is None else str(plate), 'x': np.round(x, 4).tolist(),
+                        'y': np.round(y, 2).tolist()} for plate, _, x, y in traces[sample]],
+        } for i, sample in enumerate(samples)],
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        # Labels come from the plate layout: escape them for the page, and '<' inside the script
+        # so a label holding '</script>' cannot end it
+        f.write(_HTML.format(title=html.escape(str(title)), width=int(width), height=int(height),
+                             data=json.dumps(data).replace('<', '\\u003c')))
+    return path
@@ -0,0 +1,314 @@
+import posixpath
+import re
+import zipfile
+from typing import NamedTuple
+from xml.etree.ElementTree import fromstring, iterparse
+from xml.sax.saxutils import unescape
+
+import numpy as np
+import pandas as pd
+
+from TimeFormat import parse_time
+
+_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+_ROW_PATTERN = re.compile(rb"<row\b([^>]*?)(?:/>|>(.*?)</row>)", re.S)
+_ROW_NUMBER_PATTERN = re.compile(rb' r="(\d+)"')
+# Covers the cells MARS and Excel write: <c r="C3" s="3" t="s"><v>12</v></c> or an empty <c r="B1" s="2"/>
+_CELL_PATTERN = re.compile(rb'<c r="([A-Z]+)\d+"(?: s="\d+")?(?: t="(\w+)")?(?:/>|><v>([^<]*)</v></c>)')
+
+_column_cache = {}
+_layout_cache = {}
+
+
+class MARSRaw(NamedTuple):
+    """
+    A MARS raw export held in typed arrays.
+
+    time: float64 array (cycles,) of the run time in decimal hours.
+    values: float64 array (cycles, wells) of fluorescence readings.
+    well: array (wells,) of well names, e.g. 'A01'.
+    content: object array (wells,) of the content labels from the second header row.
+    time_label: object array (cycles,) of the time cells as written by MARS.
+    read_label: the label of the reading rows, e.g. 'Raw Data (448-10/482-10)'.
+    time_header: the header of the time column, e.g. 'Time [h]'.
+    """
+    time: np.ndarray
+    values: np.ndarray
+    well: np.ndarray
+    content: np.ndarray
+    time_label: np.ndarray
+    read_label: object = None
+    time_header: object = None
+
+    def to_frame(self):
+        """
+        Rebuild the DataFrame `pd.read_excel()` returns for the same export.
+
+        :return: A DataFrame with 'Well' and time columns followed by one column per well.
+        """
+        n_cycle = self.values.shape[0]
+        head = pd.DataFrame(
+            [['Content', self.time_header] + list(self.content)],
+            columns=['Well', 'Unnamed: 1'] + list(self.well)
+        )
+        body = pd.DataFrame(self.values, columns=list(self.well))
+        body.insert(0, 'Unnamed: 1', self.time_label)
+        body.insert(0, 'Well', [self.read_label] * n_cycle)
+        return pd.concat([head, body.astype(object)], ignore_index=True)
+
+
+def _column_index(ref):
+    # 'C12' -> 2; cached because MARS exports repeat the same few hundred column letters
+    letters = ref.rstrip("0123456789")
+    index = _column_cache.get(letters)
+    if index is None:
+        index = 0
+        for char in letters:
+            index = index * 26 + ord(char) - 64
+        index -= 1
+        _column_cache[letters] = index
+    return index
+
+
+def _sheet_path(zf, sheet=0):
+    # Resolve the worksheet part through the workbook relationships instead of assuming sheet1.xml
+    workbook = fromstring(zf.read("xl/workbook.xml"))
+    sheets = workbook.find(_NS + "sheets")
+    if isinstance(sheet, str):
+        entry = next((s for s in sheets if s.get("name") == sheet), None)
+        if entry is None:
+            raise ValueError(f"Sheet '{sheet}' not found.")
+    else:
+        entry = list(sheets)[sheet]
+    rel_id = entry.get(_REL_NS + "id")
+
+    rels = fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels.iter(_PKG_REL_NS + "Relationship"):
+        if rel.get("Id") == rel_id:
+            target = rel.get("Target")
+            if target.startswith("/"):
+                return target.lstrip("/")
+            return posixpath.normpath(posixpath.join("xl", target))
+    raise ValueError(f"Worksheet part for sheet '{sheet}' not found.")
+
+
+def _shared_strings(zf):
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return []
+    strings = []
+    with zf.open("xl/sharedStrings.xml") as f:
+        for _, elem in iterparse(f):
+            if elem.tag == _NS + "si":
+                strings.append("".join(t.text or "" for t in elem.iter(_NS + "t")))
+                elem.clear()
+    return strings
+
+
+def _iter_row_xml(zf, sheet_path, block_size=1 << 18):
+    # Streams the worksheet part and yields (row_number, row_body) for every complete <row>
+    row_number = 0
+    tail = b""
+    with zf.open(sheet_path) as f:
+        while True:
+            block = f.read(block_size)
+            buffer = tail + block
+            if block:
+                cut = buffer.rfind(b"</row>")
+                if cut < 0:
+                    tail = buffer
+                    continue
+                cut += len(b"</row>")
+                buffer, tail = buffer[:cut], buffer[cut:]
+            for match in _ROW_PATTERN.finditer(buffer):
+                number = _ROW_NUMBER_PATTERN.search(match.group(1))
+                row_number = int(number.group(1)) if number else row_number + 1
+                yield row_number, match.group(2) or b""
+            if not block:
+                return
+
+
+def _row_cells_xml(body, shared):
+    # Slow path for cells the regex does not cover (formulas, inline strings, unusual attributes)
+    row = fromstring(b'<row xmlns="' + _NS[1:-1].encode() + b'">' + body + b"</row>")
+    cols, kinds, texts = [], [], []
+    col = -1
+    for c in row.iterfind(_NS + "c"):
+        ref = c.get("r")
+        col = _column_index(ref) if ref else col + 1
+        kind = c.get("t") or ""
+        if kind == "inlineStr":
+            kind, text = "str", "".join(t.text or "" for t in c.iter(_NS + "t"))
+        else:
+            v = c.find(_NS + "v")
+            if v is None or v.text is None:
+                continue
+            text = v.text
+        cols.append(col)
+        kinds.append(kind)
+        texts.append(text)
+    return np.array(cols, dtype=np.intp), np.array(kinds, dtype=object), np.array(texts, dtype=object)
+
+
+def _row_cells(body, shared):
+    """
+    Split one row into column indices, cell types and cell texts.
+
+    :return: A tuple (cols, kinds, texts) of equal-length arrays. Empty cells are dropped.
+    """
+    matches = _CELL_PATTERN.findall(body)
+    if len(matches) != body.count(b"<c ") + body.count(b"<c>"):
+        return _row_cells_xml(body, shared)
+    if not matches:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=object), np.empty(0, dtype=object)
+
+    cells = np.array(matches)
+    keep = cells[:, 2] != b""
+    cells = cells[keep]
+    # Consecutive rows nearly always span the same columns, so the decoded indices are reused
+    letters = cells[:, 0]
+    key = letters.tobytes()
+    cols = _layout_cache.get(key)
+    if cols is None:
+        cols = np.array([_column_index(ref) for ref in letters.astype(str)], dtype=np.intp)
+        if len(_layout_cache) >= 256:
+            _layout_cache.clear()
+        _layout_cache[key] = cols
+    return cols, cells[:, 1].astype(str), cells[:, 2]
+
+
+def _cell_value(kind, text, shared):
+    if kind == "s":
+        return shared[int(text)]
+    elif kind in ("str", "e"):
+        return unescape(text.decode()) if isinstance(text, bytes) else text
+    elif kind == "b":
+        return text in (b"1", "1")
+    return float(text)
+
+
+def _iter_rows(zf, sheet_path, shared):
+    # Yields (row_number, [(column_index, value), ...]) while the sheet XML is being read
+    for row_number, body in _iter_row_xml(zf, sheet_path):
+        cols, kinds, texts = _row_cells(body, shared)
+        yield row_number, [(col, _cell_value(kind, text, shared))
+                           for col, kind, text in zip(cols.tolist(), kinds, texts)]
+
+
+def _to_float(value):
+    if isinstance(value, float):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _parse_time(labels, header=None):
+    return parse_time(labels, header)
+
+
+def ReadMARS(path, sheet=0):
+    """
+    Read a MARS raw export without going through `pd.read_excel()`.
+
+    The worksheet XML is streamed row by row and the readings are written straight into a
+    float64 matrix, so no object-dtype frame is built and no later `astype(float)` is needed.
+
+    :param path: Path to the `*_raw.xlsx` export.
+    :param sheet: Index or name of the worksheet. Default is the first sheet.
+    :return: A `MARSRaw` tuple. Use `.to_frame()` for the `pd.read_excel()` layout.
+    """
+    with zipfile.ZipFile(path) as zf:
+        shared = _shared_strings(zf)
+        rows = _iter_row_xml(zf, _sheet_path(zf, sheet))
+
+        # Row 1 holds the well names, row 2 the content labels and the time header
+        _, body = next(rows)
+        cols, kinds, texts = _row_cells(body, shared)
+        is_well = cols >= 2
+        well = np.array([_cell_value(kind, text, shared)
+                         for kind, text in zip(kinds[is_well], texts[is_well])], dtype=str)
+        n_well = len(well)
+        position = np.full(max(cols.max(initial=1), 1) + 1, -1, dtype=np.intp)
+        position[cols[is_well]] = np.arange(n_well)
+
+        content = np.full(n_well, np.nan, dtype=object)
+        time_header = None
+        _, body = next(rows, (None, b""))
+        for col, kind, text in zip(*_row_cells(body, shared)):
+            if col == 1:
+                time_header = _cell_value(kind, text, shared)
+            elif 2 <= col < len(position) and position[col] >= 0:
+                content[position[col]] = _cell_value(kind, text, shared)
+
+        read_label = None
+        time_label = []
+        values = []
+        for _, body in rows:
+            cols, kinds, texts = _row_cells(body, shared)
+            if len(cols) == 0:
+                continue
+
+            row = np.full(n_well, np.nan)
+            in_plate = (cols >= 2) & (cols < len(position))
+            target = np.full(len(cols), -1, dtype=np.intp)
+            target[in_plate] = position[cols[in_plate]]
+            numeric = (target >= 0) & (kinds == "")
+            row[target[numeric]] = texts[numeric].astype(float)
+            for i in np.flatnonzero((target >= 0) & (kinds != "")):
+                row[target[i]] = _to_float(_cell_value(kinds[i], texts[i], shared))
+
+            label = np.nan
+            for i in np.flatnonzero(cols < 2):
+                if cols[i] == 1:
+                    label = _cell_value(kinds[i], texts[i], shared)
+                elif read_label is None:
+                    read_label = _cell_value(kinds[i], texts[i], shared)
+            time_label.append(label)
+            values.append(row)
+
+    values = np.vstack(values) if values else np.empty((0, len(well)))
+    time_label = np.array(time_label, dtype=object)
+
+    return MARSRaw(
+        time=_parse_time(time_label, time_header),
+        values=values,
+        well=well,
+        content=content,
+        time_label=time_label,
+        read_label=read_label,
+        time_header=time_header,
+    )
+
+
+def ReadPlate(path, sheet=0):
+    """
+    Read a plate layout file with the same streaming reader used by `ReadMARS()`.
+
+    :param path: Path to the `*_plate.xlsx` file.
+    :param sheet: Index or name of the worksheet. Default is the first sheet.
+    :return: A DataFrame laid out like `pd.read_excel(path)`.
+    """
+    with zipfile.ZipFile(path) as zf:
+        shared = _shared_strings(zf)
+        rows = list(_iter_rows(zf, _sheet_path(zf, sheet), shared))
+
+    # Formatted but empty rows are written as <row/> elements; read_excel ignores them
+    rows = [(row_number, cells) for row_number, cells in rows if cells]
+    n_col = max((col for _, cells in rows for col, _ in cells), default=-1) + 1
+    n_row = rows[-1][0] if rows else 0
+    grid = [[np.nan] * n_col for _ in range(n_row)]
+    for row_number, cells in rows:
+        row = grid[row_number - 1]
+        for col, value in cells:
+            row[col] = int(value) if isinstance(value, float) and value.is_integer() else value
+    # read_excel starts at the first non-empty row
+    grid = grid[rows[0][0] - 1:] if rows else grid
+
+    header = grid[0] if grid else []
+    columns = [f"Unnamed: {i}" if pd.isna(name) else name for i, name in enumerate(header)]
+    return pd.DataFrame(grid[1:], columns=columns).infer_objects()
@@ -0,0 +1,147 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from CleanRaw import CleanedPlate
+from MixedArrays import load_mixed, save_mixed
+
+
+class ColumnarSink:
+    """
+    Append-only on-disk store for the combined tables of `StreamBulkProcessing()`.
+
+    Each table is a folder of parts; a part holds one `.npy` file per column, so numeric columns
+    are memory-mapped on read and a reader only touches the columns it asks for. Rows are
+    buffered and written as one part every `flush_rows` rows. Opening an existing directory
+    continues after its last part.
+
+    :param directory: Folder holding the tables. Created if needed.
+    :param flush_rows: Number of buffered rows (per table) that triggers a write. Default is 100000.
+    """
+
+    def __init__(self, directory, flush_rows=100_000):
+        self.directory = directory
+        self.flush_rows = flush_rows
+        self._buffers = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+    def tables(self):
+        """Names of the tables with at least one written part."""
+        return sorted(name for name in os.listdir(self.directory)
+                      if os.path.isdir(os.path.join(self.directory, name)) and self._parts(name))
+
+    def _parts(self, table):
+        table_dir = os.path.join(self.directory, table)
+        if not os.path.isdir(table_dir):
+            return []
+        return sorted(name for name in os.listdir(table_dir) if name.startswith('part-'))
+
+    def append(self, table, frame):
+        """Buffer the rows of `frame` for `table`, writing a part once enough rows are buffered."""
+        buffer = self._buffers.setdefault(table, [])
+        buffer.append(frame)
+        if sum(len(f) for f in buffer) >= self.flush_rows:
+            self._write(table)
+
+    def flush(self):
+        """Write every buffered row."""
+        for table in list(self._buffers):
+            self._write(table)
+
+    def _write(self, table):
+        frames = self._buffers.pop(table, [])
+        if not frames:
+            return
+        frame = pd.concat(frames, ignore_index=True)
+        table_dir = os.path.join(self.directory, table)
+        os.makedirs(table_dir, exist_ok=True)
+        part_dir = os.path.join(table_dir, f"part-{len(self._parts(table)):06d}")
+
+        # Written to a sibling temp dir and renamed, so readers never see half a part
+        tmp_dir = tempfile.mkdtemp(dir=table_dir, prefix='.tmp-')
+        try:
+            columns = []
+            for i, name in enumerate(frame.columns):
+                values = frame[name].to_numpy()
+                if values.dtype.kind in 'biuf':
+                    np.save(os.path.join(tmp_dir, f"c{i}.npy"), values)
+                    kind = 'numeric'
+                else:
+                    save_mixed(tmp_dir, f"c{i}", values.astype(object))
+                    kind = 'mixed'
+                columns.append({'name': str(name), 'kind': kind})
+            with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+                json.dump({'rows': len(frame), 'columns': columns}, f)
+            os.replace(tmp_dir, part_dir)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    def read(self, table, columns=None, mmap_mode='r'):
+        """
+        Read a table back.
+
+        :param table: Table name, e.g. 'combined_calculation'.
+        :param columns: Columns to read. Default is all of them.
+        :param mmap_mode: Passed to `np.load()` for numeric columns. Use None to load into memory.
+        :return: A DataFrame with the rows of every part in the order they were appended.
+        """
+        frames = []
+        for part in self._parts(table):
+            part_dir = os.path.join(self.directory, table, part)
+            with open(os.path.join(part_dir, 'manifest.json')) as f:
+                manifest = json.load(f)
+            data = {}
+            for i, column in enumerate(manifest['columns']):
+                if columns is not None and column['name'] not in columns:
+                    continue
+                if column['kind'] == 'numeric':
+                    data[column['name']] = np.load(os.path.join(part_dir, f"c{i}.npy"), mmap_mode=mmap_mode)
+                else:
+                    data[column['name']] = load_mixed(part_dir, f"c{i}")
+            frames.append(pd.DataFrame(data, copy=False).infer_objects())
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        frame = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        return frame[list(columns)] if columns is not None else frame
+
+
+def SpillCleanRaw(cleaned_raw, directory, name):
+    """
+    Write a cleaned raw matrix to `directory/name` as `.npy` files.
+
+    :return: The folder written, to be read back with `LoadCleanRaw()`.
+    """
+    if isinstance(cleaned_raw, CleanedPlate):
+        cleaned_raw = cleaned_raw.to_frame()
+    path = os.path.join(directory, str(name))
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, 'values.npy'), np.ascontiguousarray(cleaned_raw.to_numpy(dtype=float)))
+    np.save(os.path.join(path, 'time.npy'), np.asarray(cleaned_raw.index, dtype=float))
+    save_mixed(path, 'columns', np.array(list(cleaned_raw.columns), dtype=object))
+    return path
+
+
+def LoadCleanRaw(path, mmap_mode='r'):
+    """
+    Read a matrix written by `SpillCleanRaw()`.
+
+    :param mmap_mode: Passed to `np.load()`. The default memory-maps the values.
+    :return: A DataFrame in the layout of `CleanRaw()`.
+    """
+    return pd.DataFrame(
+        np.load(os.path.join(path, 'values.npy'), mmap_mode=mmap_mode),
+        index=np.load(os.path.join(path, 'time.npy')),
+        columns=list(load_mixed(path, 'columns')),
+        copy=False,
+    )
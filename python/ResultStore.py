@@ -0,0 +1,223 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from CleanRaw import CleanedPlate
+
+# Columns of the calculation that are results rather than keys; every other column is indexed
+_METRIC_COLUMNS = {'time_to_threshold', 'RAF', 'MPR', 'MS', 'XTH', 'format'}
+_RESULT_INDEXES = ('plate_name', 'content', 'result')
+_CLEANRAW_COLUMNS = {'plate_name': 'TEXT', 'position': 'INTEGER', 'well': 'TEXT', 'content': 'TEXT',
+                     'replicate': 'REAL', 'content_replicate': 'TEXT', 'time': 'BLOB', 'value': 'BLOB'}
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _sql_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+def _rows(frame):
+    # Plain Python values, with missing values as NULL; numeric columns go through tolist() in one call
+    columns = []
+    for name in frame.columns:
+        values = frame[name].to_numpy()
+        if values.dtype.kind in 'biu':
+            columns.append(values.tolist())
+        elif values.dtype.kind == 'f':
+            missing = np.isnan(values)
+            values = values.astype(object)
+            values[missing] = None
+            columns.append(values.tolist())
+        else:
+            columns.append([None if v is None or (isinstance(v, float) and np.isnan(v)) else
+                            v.item() if isinstance(v, np.generic) else v for v in values])
+    return list(zip(*columns))
+
+
+class ResultStore:
+    """
+    SQLite store for the combined results of many batches.
+
+    Holds three tables: 'calculation' (one row per plate and well, as in
+    `BulkProcessing()['combined_calculation']`), 'result' (one row per plate and sample) and
+    'cleanraw' (one row per plate and well, with the time and fluorescence vectors stored as
+    float64 blobs). Every key column of the calculation (plate_name, well, content, replicate,
+    content_replicate and any split_content columns) is indexed, so looking up one sample across
+    thousands of plates reads only its rows. Appending a plate that is already stored replaces it.
+
+    :param path: Path of the database file. Created if needed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def _columns(self, table):
+        return [row[1] for row in self.connection.execute(f'PRAGMA table_info({_quote(table)})')]
+
+    def _ensure_table(self, table, types, indexes):
+        # New columns (e.g. split_content columns of a later batch) are added as they appear
+        existing = self._columns(table)
+        if not existing:
+            columns = ', '.join(f'{_quote(name)} {sql_type}' for name, sql_type in types.items())
+            self.connection.execute(f'CREATE TABLE {_quote(table)} ({columns})')
+        else:
+            for name, sql_type in types.items():
+                if name not in existing:
+                    self.connection.execute(f'ALTER TABLE {_quote(table)} ADD COLUMN {_quote(name)} {sql_type}')
+        for name in indexes:
+            self.connection.execute(f'CREATE INDEX IF NOT EXISTS {_quote(f"{table}_{name}")} '
+                                    f'ON {_quote(table)} ({_quote(name)})')
+
+    def _insert(self, table, frame):
+        columns = ', '.join(_quote(name) for name in frame.columns)
+        marks = ', '.join('?' * len(frame.columns))
+        self.connection.executemany(f'INSERT INTO {_quote(table)} ({columns}) VALUES ({marks})', _rows(frame))
+
+    def append_plate(self, plate_name, calculation, cleanraw=None, result=None):
+        """
+        Store the output of one plate, replacing it if already stored.
+
+        :param plate_name: Name of the plate.
+        :param calculation: Output of `GetCalculation()` for the plate.
+        :param cleanraw: Output of `CleanRaw()` (a DataFrame or `CleanedPlate`), in the row order of `calculation`.
+        :param result: Output of `SummarizeResult()` for the plate.
+        """
+        self.append(calculation.assign(plate_name=plate_name),
+                    {plate_name: cleanraw} if cleanraw is not None else None,
+                    result.assign(plate_name=plate_name) if result is not None else None)
+
+    def append(self, calculation, cleanraw=None, result=None):
+        """
+        Store a batch in one transaction. Plates already stored are replaced.
+
+        :param calculation: A combined calculation with a 'plate_name' column, or the whole output of
+                            `BulkProcessing()` (then `cleanraw` and `result` are taken from it).
+        :param cleanraw: A dict of cleaned raw matrices keyed by plate name.
+        :param result: A combined result with a 'plate_name' column.
+        """
+        if isinstance(calculation, dict):
+            processed = calculation
+            calculation = processed['combined_calculation']
+            cleanraw = processed.get('combined_cleanraw') if cleanraw is None else cleanraw
+            result = processed.get('combined_result') if result is None else result
+
+        plates = list(pd.unique(calculation['plate_name']))
+        with self.connection:
+            for table in ('calculation', 'result', 'cleanraw'):
+                if self._columns(table):
+                    self.connection.executemany(f'DELETE FROM {_quote(table)} WHERE plate_name = ?',
+                                                [(str(p),) for p in plates])
+
+            calculation = calculation.assign(plate_name=calculation['plate_name'].astype(str))
+            self._ensure_table('calculation', {name: _sql_type(dtype) for name, dtype in calculation.dtypes.items()},
+                               [name for name in calculation.columns if name not in _METRIC_COLUMNS])
+            self._insert('calculation', calculation)
+
+            if result is not None:
+                result = result.assign(plate_name=result['plate_name'].astype(str))
+                self._ensure_table('result', {name: _sql_type(dtype) for name, dtype in result.dtypes.items()},
+                                   [name for name in _RESULT_INDEXES if name in result.columns])
+                self._insert('result', result)
+
+            if cleanraw:
+                self._ensure_table('cleanraw', _CLEANRAW_COLUMNS, ('plate_name', 'content', 'content_replicate'))
+                for plate_name, frame in cleanraw.items():
+                    self._insert('cleanraw', self._cleanraw_rows(plate_name, frame, calculation))
+
+    @staticmethod
+    def _cleanraw_rows(plate_name, frame, calculation):
+        if isinstance(frame, CleanedPlate):
+            frame = frame.to_frame()
+        time = pd.to_numeric(pd.Series(frame.index), errors='coerce').to_numpy(dtype=float).tobytes()
+        values = frame.to_numpy(dtype=float)
+        meta = calculation[calculation['plate_name'] == str(plate_name)]
+        # Columns of CleanRaw follow the rows of the plate's meta, so the calculation gives well and content
+        if len(meta) != values.shape[1]:
+            meta = pd.DataFrame({'content_replicate': frame.columns})
+        return pd.DataFrame({
+            'plate_name': str(plate_name),
+            'position': np.arange(values.shape[1]),
+            'well': meta['well'].to_numpy() if 'well' in meta else None,
+            'content': meta['content'].to_numpy() if 'content' in meta else None,
+            'replicate': meta['replicate'].to_numpy() if 'replicate' in meta else None,
+            'content_replicate': np.asarray(frame.columns, dtype=object).astype(str),
+            'time': [time] * values.shape[1],
+            'value': [np.ascontiguousarray(values[:, i]).tobytes() for i in range(values.shape[1])],
+        })
+
+    def plates(self):
+        """Names of the stored plates."""
+        if not self._columns('calculation'):
+            return []
+        return [row[0] for row in self.connection.execute('SELECT DISTINCT plate_name FROM calculation')]
+
+    def query(self, table, columns=None, **filters):
+        """
+        Read rows of a table.
+
+        :param table: 'calculation', 'result' or 'cleanraw'.
+        :param columns: Columns to return. Default is all.
+        :param filters: Column equality filters; a list or tuple value matches any of its items,
+                        e.g. `store.query('calculation', content='pos', plate_name=['p1', 'p2'])`.
+        :return: A DataFrame.
+        """
+        existing = self._columns(table)
+        if not existing:
+            raise KeyError(f"Table {table} is not in the store")
+        unknown = [name for name in list(filters) + list(columns or []) if name not in existing]
+        if unknown:
+            raise KeyError(f"Columns not in {table}: {unknown}")
+
+        clauses, params = [], []
+        for name, value in filters.items():
+            if isinstance(value, (list, tuple, set, np.ndarray, pd.Index)):
+                value = list(value)
+                clauses.append(f"{_quote(name)} IN ({', '.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                clauses.append(f'{_quote(name)} = ?')
+                params.append(value)
+        select = ', '.join(_quote(name) for name in columns) if columns else '*'
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        return pd.read_sql_query(f'SELECT {select} FROM {_quote(table)}{where}', self.connection, params=params)
+
+    def sql(self, query, params=()):
+        """Run any SELECT against the store and return a DataFrame."""
+        return pd.read_sql_query(query, self.connection, params=params)
+
+    def cleanraw(self, **filters):
+        """
+        Read cleaned raw traces back as matrices.
+
+        :param filters: As in `query()`, on the 'cleanraw' columns (plate_name, well, content, replicate,
+                        content_replicate).
+        :return: A dict keyed by plate name of DataFrames in the layout of `CleanRaw()`, holding the matching wells.
+        """
+        rows = self.query('cleanraw', **filters)
+        frames = {}
+        for plate_name, group in rows.groupby('plate_name', sort=False):
+            group = group.sort_values('position')
+            values = np.column_stack([np.frombuffer(v, dtype=float) for v in group['value']])
+            frames[plate_name] = pd.DataFrame(values, index=np.frombuffer(group['time'].iloc[0], dtype=float),
+                                              columns=group['content_replicate'].to_numpy())
+        return frames
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+
+class CalculationSpread(dict):
+    """
+    Output of `SpreadCalculation()`: a dict of spread DataFrames keyed by term, backed by one array.
+
+    :ivar values: Dense float array of shape (terms, replicates, contents). Every DataFrame in the
+                  dict is a view of one `values[i]` slice, so nothing is copied per term.
+    :ivar terms: The spread terms, in the order of the first axis.
+    :ivar contents: Index of the contents, in the order of the last axis; `contents.get_loc(name)`
+                    gives the column of a content.
+    :ivar replicates: The replicate numbers, in the order of the second axis.
+    """
+
+    def __init__(self, values, terms, contents, replicates):
+        self.values = values
+        self.terms = tuple(terms)
+        self.contents = contents
+        self.replicates = replicates
+        super().__init__(
+            (term, pd.DataFrame(values[i], columns=contents, copy=False))
+            for i, term in enumerate(self.terms)
+        )
+
+    def term(self, term):
+        """The (replicates, contents) array of one term, without going through the DataFrame."""
+        return self.values[self.terms.index(term)]
+
+
+def SpreadCalculation(calculation, id_col="content", rep_col="replicate", terms=('RAF', 'MPR', 'MS')):
+    """
+    Spread Calculation Data.
+
+    This function takes a DataFrame containing metadata and calculation results,
+    and spreads the results into a dict of DataFrames for selected calculation term.
+    Each DataFrame has one column per content and one row per replicate, which is
+    compatible with graphing software such as GraphPad Prism.
+
+    :param calculation: A DataFrame containing the metadata and results of the calculation. Output from `GetCalculation()`.
+    :param id_col: The name of the column in calculation that identifies the content. Default is 'content'.
+    :param rep_col: The name of the column in calculation that identifies the replicate. Default is 'replicate'.
+    :param terms: A list of column names to spread. Defaults to 'RAF', 'MPR', and 'MS'.
+                  None spreads 'time_to_threshold' as well.
+    :return: A `CalculationSpread`, a dict of DataFrames keyed by term whose data live in one
+             (term x replicate x content) array.
+    """
+    if not all(col in calculation.columns for col in (id_col, rep_col)):
+        raise ValueError("id_col and rep_col must be present in the calculation data frame")
+
+    if terms is None:
+        terms = ('time_to_threshold', 'RAF', 'MPR', 'MS')
+
+    if not all(term in calculation.columns for term in terms):
+        raise ValueError("Not all specified terms are present in the calculation data frame")
+
+    # pivot_wider keeps contents and replicates in order of first appearance
+    content_code, contents = pd.factorize(calculation[id_col])
+    rep_code, replicates = pd.factorize(calculation[rep_col])
+    keep = (content_code >= 0) & (rep_code >= 0)
+    content_code, rep_code = content_code[keep], rep_code[keep]
+
+    cell = rep_code * len(contents) + content_code
+    if len(np.unique(cell)) != len(cell):
+        raise ValueError("Index contains duplicate entries, cannot reshape")
+
+    values = np.full((len(terms), len(replicates), len(contents)), np.nan)
+    values[:, rep_code, content_code] = calculation.loc[keep, list(terms)].to_numpy(dtype=float).T
+
+    return CalculationSpread(values, terms, pd.Index(contents), np.asarray(replicates))
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Bump when a stage's output changes so stale disk entries are ignored instead of reused
+STAGE_CACHE_VERSION = 1
+
+_MISS = object()
+
+
+def _update_hash(digest, value):
+    # Content hash of the pipeline inputs: numeric arrays and columns by their bytes, text by its repr
+    if isinstance(value, pd.DataFrame):
+        digest.update(f"frame{value.shape}".encode())
+        digest.update(repr(list(value.columns)).encode())
+        digest.update(repr(list(value.index)).encode() if not isinstance(value.index, pd.RangeIndex)
+                      else repr(value.index).encode())
+        digest.update(repr(list(value.dtypes)).encode())
+        # One block: the bytes of an all-numeric frame, otherwise the cells as objects
+        numeric = all(dtype.kind in 'biuf' for dtype in value.dtypes)
+        _update_hash(digest, value.to_numpy() if numeric else value.to_numpy(dtype=object))
+    elif isinstance(value, np.ndarray):
+        digest.update(f"array{value.dtype}{value.shape}".encode())
+        if value.dtype.kind in 'biufcmM':
+            digest.update(np.ascontiguousarray(value).tobytes())
+        else:
+            digest.update(repr(value.ravel().tolist()).encode())
+    elif isinstance(value, tuple):
+        # Also covers `MARSRaw`
+        digest.update(f"tuple{len(value)}".encode())
+        for item in value:
+            _update_hash(digest, item)
+    else:
+        digest.update(repr(value).encode())
+
+
+def _params_key(params):
+    return json.dumps(params, sort_keys=True, default=repr)
+
+
+class StageCache:
+    """
+    Memoizes the stages of `BulkProcessing()` per plate.
+
+    The key of a stage is the hash of its name, its keyword arguments and the keys of the stages
+    it consumes; the plate itself is hashed once by content. Changing the parameters of one stage
+    therefore only re-runs that stage and those downstream of it. Results are kept in an in-memory
+    LRU and, when `cache_dir` is given, pickled to disk so other processes and later runs share them.
+
+    Cached results are returned as stored; callers must not modify them in place.
+
+    :param maxsize: Number of stage results kept in memory. Default is 256.
+    :param cache_dir: Optional folder for the on-disk tier. Created if needed.
+    """
+
+    def __init__(self, maxsize=256, cache_dir=None):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def __getstate__(self):
+        # Sent to worker processes without the in-memory tier
+        state = self.__dict__.copy()
+        state['_memory'] = OrderedDict()
+        return state
+
+    def fingerprint(self, *values):
+        """Content hash of the given inputs."""
+        digest = hashlib.blake2b(digest_size=20)
+        for value in values:
+            _update_hash(digest, value)
+        return digest.hexdigest()
+
+    def key(self, stage, parents, params):
+        """Key of `stage` run with `params` on the outputs identified by `parents`."""
+        text = f"v{STAGE_CACHE_VERSION}\0{stage}\0{_params_key(params)}\0" + "\0".join(parents)
+        return hashlib.blake2b(text.encode(), digest_size=20).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.pkl')
+
+    def get(self, key):
+        """The stored result for `key`, or `_MISS`."""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+        if self.cache_dir is not None and os.path.exists(self._path(key)):
+            with open(self._path(key), 'rb') as f:
+                value = pickle.load(f)
+            self._remember(key, value)
+            return value
+        return _MISS
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.cache_dir is not None:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Written to a temp file and renamed, so readers never see half an entry
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+    def _remember(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def run(self, stage, parents, func, inputs, params):
+        """
+        Return `func(**inputs, **params)`, computing it only on a miss.
+
+        :param stage: Stage name, part of the key.
+        :param parents: Keys (or fingerprints) identifying `inputs`, which are not hashed themselves.
+        :param inputs: A dict of the data arguments of `func`.
+        :param params: A dict of the other keyword arguments of `func`, part of the key.
+        :return: A tuple (result, key); pass the key on as a parent of downstream stages.
+        """
+        key = self.key(stage, parents, params)
+        value = self.get(key)
+        if value is _MISS:
+            self.misses += 1
+            value = func(**inputs, **params)
+            self.put(key, value)
+        else:
+            self.hits += 1
+        return value, key
+
+    def clear(self):
+        """Empty the in-memory tier."""
+        self._memory.clear()
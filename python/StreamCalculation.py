@@ -0,0 +1,296 @@
+import os
+import time as _time
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from GetCalculation import THRESHOLD_METHODS, calculate_threshold, metrics_to_frame
+from ReadMARS import ReadMARS, _to_float
+from TimeFormat import parse_time
+
+
+class StreamingCalculation:
+    """
+    Incremental GetCalculation for a run that is still acquiring.
+
+    Cycles are fed one at a time with `update()` (or several with `extend()`). Each cycle costs
+    O(wells): the running maximum, the first threshold crossing and the maximum slope over a
+    window of `binw` cycles are updated in place, and nothing is recomputed from earlier cycles.
+    Once every cycle of a run has been fed, `metrics()` equals `calculate_metrics()` on the full matrix.
+
+    Parameters are those of `GetCalculation()`.
+    """
+
+    def __init__(self, wells, threshold_method="stdv", time_skip=5, sd_fold=3, bg_fold=3, rfu=5000,
+                 cycle_background=4, binw=6):
+        if threshold_method not in THRESHOLD_METHODS:
+            raise ValueError("Invalid threshold_method. Use 'stdv', 'bg_ratio', or 'rfu_val'.")
+        if binw < 1:
+            raise ValueError("binw must be at least 1")
+
+        self.wells = pd.Index(wells)
+        self.threshold_method = threshold_method
+        self.sd_fold = sd_fold
+        self.bg_fold = bg_fold
+        self.rfu = rfu
+        self.cycle_background = cycle_background
+        self.binw = binw
+        # Same rule as calculate_raf(): the first cycle is always skipped, and with time_skip = 0
+        # the crossing is reported at the time of the cycle before it
+        self.skip = max(int(time_skip), 1)
+        self._report_previous = int(time_skip) <= 0
+        self._last_time = np.nan
+
+        n_well = len(self.wells)
+        self.n_cycle = 0
+        self.threshold = None
+        self._background = None
+        self._max = np.full(n_well, -np.inf)
+        self._ms = np.full(n_well, -np.inf)
+        self._window = np.empty((binw, n_well))
+        self._time_to_threshold = np.full(n_well, np.nan)
+        self._crossed = np.zeros(n_well, dtype=bool)
+        # Cycles after time_skip that arrive before the background cycle, checked once the threshold is known
+        self._pending = []
+
+    def _check(self, cycle_time, row):
+        hit = ~self._crossed & (row > self.threshold)
+        self._time_to_threshold[hit] = cycle_time
+        self._crossed |= hit
+        return np.flatnonzero(hit)
+
+    def update(self, cycle_time, values):
+        """
+        Add one cycle.
+
+        :param cycle_time: Time of the cycle in hours.
+        :param values: Fluorescence of every well, in the order of `wells`.
+        :return: Positions of the wells that crossed the threshold because of this cycle.
+        """
+        row = np.asarray(values, dtype=float)
+        if row.shape != self._max.shape:
+            raise ValueError(f"Expected {len(self._max)} values per cycle, got {row.shape}")
+        cycle = self.n_cycle
+
+        np.maximum(self._max, row, out=self._max)
+
+        slot = cycle % self.binw
+        if cycle >= self.binw:
+            slope = (row - self._window[slot]) / self.binw
+            # fmax skips NaN like max(na.rm = TRUE)
+            np.fmax(self._ms, slope, out=self._ms)
+        self._window[slot] = row
+
+        crossed = []
+        if cycle == self.cycle_background - 1:
+            self._background = row.copy()
+            self.threshold = calculate_threshold(row, self.threshold_method, self.sd_fold, self.bg_fold, self.rfu)
+            crossed.extend(self._check(t, r) for t, r in self._pending)
+            self._pending = []
+
+        if cycle >= self.skip:
+            reported_time = self._last_time if self._report_previous else cycle_time
+            if self.threshold is None:
+                self._pending.append((reported_time, row.copy()))
+            else:
+                crossed.append(self._check(reported_time, row))
+
+        self._last_time = cycle_time
+        self.n_cycle += 1
+        return np.concatenate(crossed) if crossed else np.empty(0, dtype=int)
+
+    def extend(self, times, values):
+        """
+        Add several cycles.
+
+        :param times: Time of each cycle in hours, shape (cycles,).
+        :param values: Fluorescence array of shape (cycles, wells).
+        :return: Positions of the wells that crossed the threshold in these cycles.
+        """
+        crossed = [self.update(t, row) for t, row in zip(times, np.asarray(values, dtype=float))]
+        return np.concatenate(crossed) if crossed else np.empty(0, dtype=int)
+
+    @property
+    def crossed_wells(self):
+        """Names of the wells that have crossed the threshold so far."""
+        return self.wells[self._crossed]
+
+    def metrics(self):
+        """
+        Metrics of the cycles seen so far.
+
+        :return: A dict of arrays of shape (wells,) keyed by 'time_to_threshold', 'RAF', 'MPR' and 'MS',
+                 as returned by `calculate_metrics()`. MPR is NaN until the background cycle has been
+                 fed and MS is -Inf until more than `binw` cycles have been fed.
+        """
+        time_to_threshold = self._time_to_threshold.copy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            raf = 1 / time_to_threshold
+            if self._background is None:
+                mpr = np.full(self._max.shape, np.nan)
+            else:
+                mpr = self._max / self._background
+        raf[~np.isfinite(raf)] = 0
+        return {
+            'time_to_threshold': time_to_threshold,
+            'RAF': raf,
+            'MPR': mpr,
+            'MS': self._ms.copy(),
+        }
+
+    def to_calculation(self, meta, norm=False, norm_ct=None):
+        """
+        Current metrics in the layout of `GetCalculation()`.
+
+        :param meta: Cleaned meta data. Output from `CleanMeta()`; its 'well' column selects the wells.
+        :param norm: Boolean. If True, normalization will be performed. Default is False.
+        :param norm_ct: Sample name used to normalize calculation.
+        :return: A DataFrame containing the results of the calculation.
+        """
+        position = self.wells.get_indexer(meta['well'])
+        if (position < 0).any():
+            missing = list(meta['well'][position < 0])
+            raise KeyError(f"Wells not found in raw data: {missing}")
+        metrics = {name: values[position] for name, values in self.metrics().items()}
+        return metrics_to_frame(metrics, meta, norm=norm, norm_ct=norm_ct)
+
+
+class MARSTail:
+    """
+    Feed a `StreamingCalculation` from a MARS export that is still being written.
+
+    Text exports (CSV/TSV in the sheet layout: a 'Well' header row, a 'Content' row, then one row
+    per cycle with the read label, the time and the readings) are read from the last complete line
+    onwards. `.xlsx` exports cannot be appended to, so they are re-read with `ReadMARS()` whenever
+    the file changes and only the new cycles are fed.
+
+    :param path: Path to the growing export.
+    :param delimiter: Field delimiter of a text export. Detected from the header row by default.
+    :param meta: Cleaned meta data. Output from `CleanMeta()`. Only its wells are followed, so the
+                 'stdv' threshold is computed over the same wells as in `GetCalculation()`.
+                 Default is every exported well.
+    :param params: Keyword arguments of `StreamingCalculation`.
+    """
+
+    def __init__(self, path, delimiter=None, meta=None, **params):
+        self.path = path
+        self.meta = meta
+        self.delimiter = delimiter
+        self.params = params
+        self.engine = None
+        self.content = None
+        self._xlsx = path.lower().endswith('.xlsx')
+        self._offset = 0
+        self._state = None
+        self._n_export = 0
+        self._position = None
+        self._time_header = None
+
+    def _start(self, wells, content=None):
+        # position: column of each followed well among the exported ones
+        wells = pd.Index(wells)
+        self._n_export = len(wells)
+        if self.meta is None:
+            followed, self._position = wells, np.arange(len(wells))
+        else:
+            followed = pd.Index(self.meta['well'])
+            self._position = wells.get_indexer(followed)
+            if (self._position < 0).any():
+                missing = list(followed[self._position < 0])
+                raise KeyError(f"Wells not found in raw data: {missing}")
+        if content is not None:
+            self.content = np.asarray(content, dtype=object)[self._position]
+        self.engine = StreamingCalculation(followed, **self.params)
+
+    def _poll_xlsx(self):
+        try:
+            raw = ReadMARS(self.path)
+        except (zipfile.BadZipFile, KeyError, EOFError):
+            # The export is being rewritten; try again on the next poll
+            return np.empty(0, dtype=int)
+        if self.engine is None:
+            self._start(raw.well, raw.content)
+        start = self.engine.n_cycle
+        if len(raw.time) <= start:
+            # Only the header, or no cycle since the last poll
+            return np.empty(0, dtype=int)
+        return self.engine.extend(raw.time[start:], raw.values[start:, self._position])
+
+    def _poll_text(self):
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            chunk = f.read()
+        # Only complete lines are consumed; a partly written last line is read again next time
+        end = chunk.rfind(b'\n') + 1
+        self._offset += end
+        crossed = []
+        for line in chunk[:end].decode('utf-8', errors='replace').splitlines():
+            if not line.strip():
+                continue
+            if self.delimiter is None:
+                self.delimiter = '\t' if '\t' in line else (';' if ';' in line and ',' not in line else ',')
+            cells = [cell.strip().strip('"') for cell in line.split(self.delimiter)]
+
+            if self.engine is None:
+                if cells[0].lower() == 'well':
+                    self._start(cells[2:])
+                continue
+            if cells[0].lower() == 'content':
+                # The time header ('Time [h]', 'Time [min]', ...) gives the unit of numeric time labels
+                self._time_header = cells[1] or None
+                labels = cells[2:2 + self._n_export]
+                content = np.full(self._n_export, np.nan, dtype=object)
+                content[:len(labels)] = labels
+                self.content = content[self._position]
+                continue
+            if len(cells) < 3:
+                continue
+
+            cycle_time = parse_time([cells[1]], self._time_header)[0]
+            if np.isnan(cycle_time):
+                continue
+            values = np.full(self._n_export, np.nan)
+            # Overflow markers and other text readings become NaN, as in ReadMARS
+            readings = [_to_float(v) if v else np.nan for v in cells[2:2 + self._n_export]]
+            values[:len(readings)] = readings
+            crossed.append(self.engine.update(cycle_time, values[self._position]))
+        return np.concatenate(crossed) if crossed else np.empty(0, dtype=int)
+
+    def poll(self):
+        """
+        Read whatever was appended since the last call.
+
+        :return: Names of the wells that crossed the threshold in the new cycles.
+        """
+        if not os.path.exists(self.path):
+            return pd.Index([])
+        st = os.stat(self.path)
+        state = (st.st_size, st.st_mtime_ns)
+        if state == self._state:
+            return pd.Index([])
+        self._state = state
+
+        crossed = self._poll_xlsx() if self._xlsx else self._poll_text()
+        if self.engine is None:
+            return pd.Index([])
+        return self.engine.wells[crossed]
+
+    def follow(self, poll_interval=30.0, idle_timeout=None):
+        """
+        Poll the export until it stops growing.
+
+        :param poll_interval: Seconds between polls. Default is 30.
+        :param idle_timeout: Stop after this many seconds without new data. Default is None (never stop).
+        :return: A generator yielding `(n_cycle, crossed_wells)` each time new cycles arrive.
+        """
+        last_change = _time.monotonic()
+        while True:
+            n_cycle = self.engine.n_cycle if self.engine is not None else 0
+            crossed = self.poll()
+            if self.engine is not None and self.engine.n_cycle > n_cycle:
+                last_change = _time.monotonic()
+                yield self.engine.n_cycle, crossed
+            elif idle_timeout is not None and _time.monotonic() - last_change >= idle_timeout:
+                return
+            _time.sleep(poll_interval)
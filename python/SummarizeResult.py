@@ -0,0 +1,124 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+def _has_star(values):
+    return np.array([isinstance(v, str) and '*' in v for v in values], dtype=bool)
+
+
+def SummarizeResult(analysis=None, calculation=None, sig_method="xth_percent", method_threshold=50):
+    """
+    Summarize Analysis Results.
+
+    This function combines analysis results from multiple tests with metadata,
+    and determines overall significance based on a specified method. By default, it
+    evaluates sample-level result by calculating the percentage of technical replicates
+    that exceed the pre-defined threshold.
+
+    Contents are integer-coded once and every aggregate is computed from those codes in a
+    single grouped pass. A combined table of many plates (with a 'plate_name' column, as in
+    `BulkProcessing()['combined_calculation']`) is summarized per (plate_name, content).
+
+    :param analysis: Output of `GetAnalysis()` (a dict of DataFrames indexed by content), the
+                     table returned by `GetBatchAnalysis()`, or None to summarize the calculation only.
+    :param calculation: Output of `GetCalculation()`, or the combined calculation of many plates.
+    :param sig_method: Approach for determining the sample-level result: 'xth_percent', 'metric_count',
+                       'xth_count', or any metric name present in `analysis`. Default is 'xth_percent'.
+    :param method_threshold: Threshold for the 'metric_count', 'xth_count' and 'xth_percent' methods. Default is 50.
+    :return: A DataFrame with one row per content and the columns 'content', 'result', 'method', 'position',
+             '<metric>_sig' and '<metric>_p' for each analysed metric, 'metric_count', 'xth_count',
+             'total_rep' and 'xth_percent', followed by 'plate_name' for a multi-plate table.
+    """
+    if not isinstance(calculation, pd.DataFrame) or 'content' not in calculation.columns:
+        raise ValueError("'calculation' must be a data frame with a 'content' column")
+
+    by_plate = 'plate_name' in calculation.columns
+    if by_plate:
+        keys = pd.MultiIndex.from_arrays([calculation['plate_name'], calculation['content']])
+    else:
+        keys = pd.Index(calculation['content'])
+    codes, groups = pd.factorize(keys)
+    n_group = len(groups)
+    contents = groups.get_level_values(1) if by_plate else groups
+
+    # One sort by (group, well) serves every per-group aggregate
+    wells = calculation['well'].astype(str).to_numpy() if 'well' in calculation.columns else np.full(len(codes), '')
+    order = np.lexsort((wells, codes))
+    order = order[codes[order] >= 0]
+    sorted_codes = codes[order]
+    starts = np.searchsorted(sorted_codes, np.arange(n_group))
+    ends = np.searchsorted(sorted_codes, np.arange(n_group), side='right')
+
+    result = pd.DataFrame({'content': np.asarray(contents, dtype=object), 'result': ''})
+    result['method'] = sig_method
+
+    well_values = calculation['well'].to_numpy(dtype=object)[order] if 'well' in calculation.columns else None
+    result['position'] = [
+        "-".join(str(w) for w in well_values[s:e] if not pd.isna(w)) if well_values is not None else None
+        for s, e in zip(starts, ends)
+    ]
+
+    if isinstance(analysis, pd.DataFrame) or (isinstance(analysis, dict) and len(analysis) > 0):
+        if isinstance(analysis, pd.DataFrame):
+            metrics = {metric: table for metric, table in analysis.groupby('metric', sort=False)}
+        else:
+            metrics = analysis
+
+        valid_sig_methods = ["metric_count", "xth_count", "xth_percent"] + list(metrics.keys())
+        if sig_method not in valid_sig_methods:
+            raise ValueError(f"Invalid sig_method. Must be one of: {', '.join(valid_sig_methods)}")
+
+        for stat_name, stat in metrics.items():
+            if not all(col in stat.columns for col in ('significant', 'p_value')):
+                warnings.warn(f"Skipping {stat_name} due to missing 'significant' or 'p_value' column")
+                continue
+            # Each summary row looks up its row of the analysis with one hash lookup, like R's match()
+            if by_plate and 'plate_name' in stat.columns:
+                stat_keys = pd.MultiIndex.from_arrays([stat['plate_name'], stat['content']])
+                position = stat_keys.get_indexer(groups)
+            else:
+                stat_keys = pd.Index(stat['content'] if 'content' in stat.columns else stat.index)
+                position = stat_keys.get_indexer(contents)
+            found = position >= 0
+            p_col = 'adj_p' if 'adj_p' in stat.columns else 'p_value'
+
+            sig = np.full(n_group, np.nan, dtype=object)
+            p_value = np.full(n_group, np.nan)
+            sig[found] = stat['significant'].to_numpy(dtype=object)[position[found]]
+            p_value[found] = stat[p_col].to_numpy(dtype=float)[position[found]]
+            result[f"{stat_name}_sig"] = sig
+            result[f"{stat_name}_p"] = p_value
+
+        sig_columns = [col for col in result.columns if col.endswith("_sig")]
+        result['metric_count'] = np.sum([_has_star(result[col]) for col in sig_columns], axis=0).astype(int) \
+            if sig_columns else 0
+
+        if sig_method == "metric_count":
+            result.loc[result['metric_count'] >= method_threshold, 'result'] = "*"
+        elif sig_method in ("MS", "MPR", "RAF"):
+            sig_column = f"{sig_method}_sig"
+            if sig_column in result.columns:
+                result.loc[_has_star(result[sig_column]), 'result'] = "*"
+            else:
+                warnings.warn(f"Column {sig_column} not found in results. No overall result calculated.")
+    elif analysis is not None:
+        warnings.warn("'analysis' is empty or not a dict. Metric, metric count, and metric p-value columns will not be included.")
+
+    valid = codes >= 0
+    xth = calculation['XTH'].to_numpy(dtype=float)
+    result['xth_count'] = np.bincount(codes[valid], weights=xth[valid], minlength=n_group).astype(int)
+    replicate = calculation['replicate'].to_numpy(dtype=float)[order]
+    total_rep = np.fmax.reduceat(replicate, starts) if len(replicate) else np.empty(0)
+    result['total_rep'] = np.where(ends > starts, total_rep, np.nan)
+    result['xth_percent'] = np.round(result['xth_count'] / result['total_rep'] * 100, 2)
+
+    if sig_method == "xth_count":
+        result.loc[result['xth_count'] >= method_threshold, 'result'] = "*"
+    elif sig_method == "xth_percent":
+        result.loc[result['xth_percent'] >= method_threshold, 'result'] = "*"
+
+    if by_plate:
+        result['plate_name'] = groups.get_level_values(0)
+
+    return result
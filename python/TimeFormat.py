@@ -0,0 +1,82 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+TIME_FORMATS = ("units", "hours", "minutes", "seconds")
+
+# One pass extracts every component of "X h Y min Z s"; any of them may be missing
+_UNIT_PATTERN = re.compile(
+    r"^\s*(?:(?P<h>\d+(?:\.\d+)?)\s*h)?\s*(?:(?P<min>\d+(?:\.\d+)?)\s*min)?\s*(?:(?P<s>\d+(?:\.\d+)?)\s*s)?\s*$"
+)
+_UNIT_SEARCH = re.compile(r"\d\s*(?:h|min|s)\b")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+# Unit of a plain numeric time column, from headers such as 'Time [h]' or 'Time [min]'
+_HEADER_UNIT = re.compile(r"\[\s*(h|min|s)\s*\]")
+_NO_MATCH = (None, None, None)
+_SCALE = {"hours": 1.0, "minutes": 60.0, "seconds": 3600.0}
+
+_format_cache = {}
+
+
+def _ends(labels):
+    return (labels[0], labels[-1]) if len(labels) else ()
+
+
+def _signature(labels, header):
+    # MARS exports of one protocol share the header and the shape of their first and last labels
+    return str(header), tuple(_NUMBER.sub("#", str(label)).strip() for label in _ends(labels))
+
+
+def detect_time_format(labels, header=None):
+    """
+    Detect the format of a MARS time column, once per header signature.
+
+    :param labels: The time cells of one export, numbers or strings such as '1 h 30 min'.
+    :param header: The header of the time column, e.g. 'Time [h]'. Used for plain numbers.
+    :return: 'units' for labels with h/min/s units, otherwise 'hours', 'minutes' or 'seconds'.
+    """
+    key = _signature(labels, header)
+    time_format = _format_cache.get(key)
+    if time_format is None:
+        if any(_UNIT_SEARCH.search(str(label)) for label in _ends(labels)):
+            time_format = "units"
+        else:
+            unit = _HEADER_UNIT.search(str(header)) if header is not None else None
+            unit = unit.group(1) if unit else "h"
+            time_format = {"h": "hours", "min": "minutes", "s": "seconds"}[unit]
+        _format_cache[key] = time_format
+    return time_format
+
+
+def parse_time(labels, header=None, time_format=None):
+    """
+    Convert a MARS time column to decimal hours in one pass.
+
+    In the 'units' format a missing component counts as 0 ('30 min' is 0.5 h), and a bare number
+    is read as hours. Cells that cannot be parsed give NaN.
+
+    :param labels: The time cells, numbers or strings.
+    :param header: The header of the time column, used to detect the format.
+    :param time_format: One of `TIME_FORMATS`. Default is to detect it with `detect_time_format()`.
+    :return: A float64 array of the time in hours.
+    """
+    labels = np.asarray(labels, dtype=object)
+    if time_format is None:
+        time_format = detect_time_format(labels, header)
+    elif time_format not in TIME_FORMATS:
+        raise ValueError(f"Invalid time_format. Must be one of: {', '.join(TIME_FORMATS)}")
+
+    if time_format != "units":
+        return pd.to_numeric(pd.Series(labels), errors="coerce").to_numpy(dtype=float) / _SCALE[time_format]
+
+    # One match per cell with the precompiled pattern; missing groups become NaN
+    matches = [_UNIT_PATTERN.match(str(label)) for label in labels]
+    parts = np.array([m.groups() if m else _NO_MATCH for m in matches], dtype=float).reshape(-1, 3)
+    matched = ~np.isnan(parts).all(axis=1)
+    hours, minutes, seconds = np.nan_to_num(parts).T
+    time = hours + minutes / 60 + seconds / 3600
+    if not matched.all():
+        # Bare numbers in a unit column are hours
+        time[~matched] = pd.to_numeric(pd.Series(labels[~matched]), errors="coerce").to_numpy(dtype=float)
+    return time
@@ -0,0 +1,26 @@
+import pytest
+
+from BulkProcessing import _timed_items
+from Instrumentation import Instrumentation
+
+
+def _reader(n, error=None):
+    for i in range(n):
+        yield f'plate_{i}', {'raw': None}
+    if error is not None:
+        raise error
+
+
+def test_timed_items_closes_every_read():
+    instrument = Instrumentation(memory=None)
+    assert [name for name, _ in _timed_items(_reader(2), instrument)] == ['plate_0', 'plate_1']
+    assert instrument._open == []
+    assert [r['plate'] for r in instrument.records] == ['plate_0', 'plate_1']
+
+
+def test_timed_items_failed_read():
+    instrument = Instrumentation(memory=None)
+    with pytest.raises(OSError):
+        list(_timed_items(_reader(1, OSError('truncated export')), instrument))
+    assert instrument._open == []
+    assert [r['ok'] for r in instrument.records] == [True, False]
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from GetAnalysis import p_adjust_bh
+
+
+def test_p_adjust_bh_without_missing():
+    # All five ranks adjust to 5 / 5 * 0.05
+    np.testing.assert_allclose(p_adjust_bh([0.01, 0.02, 0.03, 0.04, 0.05]), [0.05] * 5)
+
+
+def test_p_adjust_bh_counts_missing_values():
+    # Worked from the BH formula with n = length(p) = 5, missing values included:
+    # 0.04 -> 5/3 * 0.04, 0.03 -> min(5/2 * 0.03, previous), 0.01 -> 5/1 * 0.01
+    p = [0.01, np.nan, 0.04, 0.03, np.nan]
+    expected = [0.05, np.nan, 5 / 3 * 0.04, 5 / 3 * 0.04, np.nan]
+    np.testing.assert_allclose(p_adjust_bh(p), expected)
+
+
+def test_p_adjust_bh_explicit_n():
+    p = [0.01, np.nan, 0.04, 0.03, np.nan]
+    np.testing.assert_allclose(p_adjust_bh(p, n=3), [0.03, np.nan, 0.04, 0.04, np.nan])
+    with pytest.raises(ValueError):
+        p_adjust_bh(p, n=2)
+
+
+def test_p_adjust_bh_all_missing():
+    assert np.isnan(p_adjust_bh([np.nan, np.nan])).all()
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from GetCalculation import GetCalculation, SweepCalculation, calculate_metrics, sweep_metrics
+from StreamCalculation import StreamingCalculation
+
+
+def _plate(n_cycle=8):
+    time = np.arange(n_cycle) / 2
+    values = np.full((n_cycle, 2), 1000.0)
+    values[n_cycle // 2:, 1] = 9000
+    raw = pd.DataFrame(values, index=time, columns=['neg_1', 'pos_1'])
+    meta = pd.DataFrame({'well': ['A01', 'A02'], 'content': ['neg', 'pos'], 'replicate': [1.0, 1.0],
+                         'content_replicate': ['neg_1', 'pos_1'], 'format': 96})
+    return raw, meta
+
+
+@pytest.mark.parametrize('time_skip', [8, 20])
+def test_time_skip_past_last_cycle_never_crosses(time_skip):
+    raw, meta = _plate()
+    params = dict(time_skip=time_skip, threshold_method='rfu_val', rfu=5000, cycle_background=1, binw=2)
+
+    calculation = GetCalculation(raw, meta, **params)
+    assert calculation['time_to_threshold'].isna().all()
+    assert (calculation['RAF'] == 0).all()
+    assert (calculation['XTH'] == 0).all()
+
+    stacked = calculate_metrics(np.stack([raw.to_numpy()] * 3), raw.index.to_numpy(), **params)
+    assert stacked['time_to_threshold'].shape == (3, 2)
+    assert np.isnan(stacked['time_to_threshold']).all()
+
+    swept = sweep_metrics(raw.to_numpy(), raw.index.to_numpy(), [dict(params, sd_fold=3, bg_fold=3)])[0]
+    assert np.isnan(swept['time_to_threshold']).all()
+
+    streaming = StreamingCalculation(meta['well'], **params)
+    streaming.extend(raw.index.to_numpy(), raw.to_numpy())
+    assert np.isnan(streaming.metrics()['time_to_threshold']).all()
+
+
+def test_time_skip_inside_run_still_crosses():
+    raw, meta = _plate()
+    calculation = GetCalculation(raw, meta, time_skip=7, threshold_method='rfu_val', rfu=5000,
+                                 cycle_background=1, binw=2)
+    assert calculation['time_to_threshold'].tolist()[1] == 3.5
+
+
+@pytest.mark.parametrize('grid', [[], {'sd_fold': []}, {'sd_fold': [2, 3], 'rfu': []}])
+def test_sweep_empty_grid(grid):
+    raw, meta = _plate()
+    with pytest.raises(ValueError, match="no parameter sets"):
+        SweepCalculation(raw, meta, grid)
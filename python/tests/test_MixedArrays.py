@@ -0,0 +1,14 @@
+import numpy as np
+
+from MixedArrays import load_mixed, save_mixed
+
+
+def test_round_trip_keeps_cell_types(tmp_path):
+    values = np.array([['A1', 1, 2.5], [True, None, np.nan]], dtype=object)
+    save_mixed(str(tmp_path), 'cells', values)
+    loaded = load_mixed(str(tmp_path), 'cells')
+    assert loaded.shape == (2, 3)
+    assert [type(v) for v in loaded[0]] == [str, int, float]
+    assert loaded[0].tolist() == ['A1', 1, 2.5]
+    assert loaded[1, 0]
+    assert np.isnan(loaded[1, 1]) and np.isnan(loaded[1, 2])
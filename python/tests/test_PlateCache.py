@@ -0,0 +1,30 @@
+import os
+
+import pandas as pd
+
+import PlateCache
+from GetReplicate import GetReplicate
+from PlateCache import LoadPlateFolder
+
+FOLDER = os.path.join(os.path.dirname(__file__), '..', '..', 'tutorials', 'data', 'grinder', '20221110_M2')
+PLATE = os.path.join(FOLDER, '20221110_M2_plate.xlsx')
+RAW = os.path.join(FOLDER, '20221110_M2_raw.xlsx')
+
+
+def _other_replicate(plate):
+    return GetReplicate(plate) + 100
+
+
+def test_rebuild_lost_to_other_replicate_func(tmp_path, monkeypatch):
+    save_entry = PlateCache._save_entry
+
+    def other_writer_wins(entry_dir, plate, raw, replicate, sources, replicate_func=None):
+        save_entry(entry_dir, plate, raw, _other_replicate(plate), sources, _other_replicate)
+
+    monkeypatch.setattr(PlateCache, '_save_entry', other_writer_wins)
+    loaded = LoadPlateFolder(PLATE, RAW, str(tmp_path), replicate_func=GetReplicate)
+    pd.testing.assert_frame_equal(loaded['replicate'], GetReplicate(loaded['plate']), check_dtype=False)
+
+    monkeypatch.undo()
+    cached = LoadPlateFolder(PLATE, RAW, str(tmp_path), replicate_func=GetReplicate)
+    pd.testing.assert_frame_equal(cached['replicate'], GetReplicate(cached['plate']), check_dtype=False)
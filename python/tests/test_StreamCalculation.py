@@ -0,0 +1,43 @@
+import numpy as np
+
+from StreamCalculation import MARSTail
+
+
+def _write_export(path, header, times, rows):
+    lines = ['Well,Time,A01,A02', f'Content,{header},neg,pos']
+    lines += [','.join(['Raw', str(t)] + [str(v) for v in row]) for t, row in zip(times, rows)]
+    path.write_text('\n'.join(lines) + '\n')
+
+
+def test_text_export_time_header_sets_unit(tmp_path):
+    path = tmp_path / 'run.csv'
+    rows = [[1000, 1000]] * 4 + [[1000, 9000]] * 4
+    _write_export(path, 'Time [min]', [15 * i for i in range(8)], rows)
+
+    tail = MARSTail(str(path), time_skip=1, cycle_background=1, threshold_method='rfu_val', rfu=5000)
+    tail.poll()
+
+    assert tail.engine.n_cycle == 8
+    # The first reading over 5000 is at 60 min, i.e. 1 h
+    np.testing.assert_allclose(tail.engine.metrics()['time_to_threshold'], [np.nan, 1.0])
+
+
+def test_text_export_unit_labels(tmp_path):
+    path = tmp_path / 'run.csv'
+    _write_export(path, 'Time', ['0 h', '0 h 30 min', '1 h', '1 h 30 min'], [[1000, 1000], [1000, 1000],
+                                                                             [1000, 9000], [1000, 9000]])
+    tail = MARSTail(str(path), time_skip=1, cycle_background=1, threshold_method='rfu_val', rfu=5000)
+    tail.poll()
+    np.testing.assert_allclose(tail.engine.metrics()['time_to_threshold'], [np.nan, 1.0])
+
+
+def test_text_export_overflow_cell_is_missing(tmp_path):
+    path = tmp_path / 'run.csv'
+    rows = [[1000, 1000], [1000, 1000], ['overflow', 9000], [1000, 9000]]
+    _write_export(path, 'Time [h]', [0, 0.5, 1, 1.5], rows)
+
+    tail = MARSTail(str(path), time_skip=1, cycle_background=1, threshold_method='rfu_val', rfu=5000)
+    assert list(tail.poll()) == ['A02']
+
+    assert tail.engine.n_cycle == 4
+    np.testing.assert_allclose(tail.engine.metrics()['time_to_threshold'], [np.nan, 1.0])